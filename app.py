@@ -1,15 +1,12 @@
 # SafeNest AI -  Frontend with Modern Design
 import streamlit as st
-from PIL import Image
-import io
-import base64
-from datetime import datetime
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from simplified_backend import AgentOrchestrator, ChatAgent
+import hashlib
+import os
+from datetime import date, datetime
+from safenest import ChatAgent, ReportStore
+from safenest.jobs import DONE, FAILED, JobQueue, WorkerPool
+from safenest.imaging import make_thumbnail
 from translations import get_text
-import time
 
 # Page Configuration
 st.set_page_config(
@@ -378,12 +375,70 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Initialize orchestrator
+# Inspections run as persistent jobs drained by worker processes, so they survive reruns
 @st.cache_resource
-def get_orchestrator():
-    return AgentOrchestrator()
+def get_job_queue():
+    return JobQueue()
 
-orchestrator = get_orchestrator()
+@st.cache_resource
+def get_worker_pool():
+    # SAFENEST_JOB_WORKERS=0 leaves the queue to external workers (python -m safenest.jobs)
+    return WorkerPool().start()
+
+# Finished reports are kept on disk, so reloads and shared ?report_id= links skip the analysis entirely
+@st.cache_resource
+def get_report_store():
+    return ReportStore()
+
+job_queue = get_job_queue()
+worker_pool = get_worker_pool()
+report_store = get_report_store()
+
+def results_from_report(report):
+    """Shape an orchestrator report into the results the dashboard tabs render"""
+    return {
+        'total_defects': report.get('total_defects', 0),
+        'high_risk': report.get('high_risk', 0),
+        'medium_risk': report.get('medium_risk', 0),
+        'low_risk': report.get('low_risk', 0),
+        'estimated_cost': report.get('total_cost', 0),
+        'risk_score': report.get('risk_score', 0),
+        'compliance_violations': report.get('compliance_violations', 0),
+        'compliance_reviews': report.get('compliance_reviews', 0),
+        'defects': [
+            {
+                'type': d['type'],
+                'severity': d['severity'],
+                'location': d['location'],
+                'confidence': d['confidence'],
+                'cost': d['estimated_cost'],
+                'irc_code': d.get('irc_code', ''),
+                'description': d.get('description', '')
+            }
+            for d in report.get('all_defects', [])
+        ],
+        'violations': report.get('violations', []),
+        'rag_references': report.get('rag_references', []),
+        'recommendations': report.get('recommendations', [])
+    }
+
+# One chat agent per process; its OpenAI client keeps connections warm between questions
+@st.cache_resource
+def get_chat_agent():
+    return ChatAgent()
+
+# Gallery previews are keyed by content hash, so reruns neither decode nor resend full-size uploads
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_thumbnail(file_hash, _img_bytes):
+    return make_thumbnail(_img_bytes)
+
+def upload_hash(uploaded_file):
+    """Content hash of an upload, computed once per uploaded file rather than on every rerun"""
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    key = getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    if key not in hashes:
+        hashes[key] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return hashes[key]
 
 # Animated Header with Day/Night Icon
 # Get current language for header
@@ -427,6 +482,20 @@ if 'mock_results' not in st.session_state:
     st.session_state.mock_results = None
 if 'lang' not in st.session_state:
     st.session_state.lang = 'en'  # Default to English
+if 'report_meta' not in st.session_state:
+    st.session_state.report_meta = {}
+
+# Open a stored report from the URL (shared link or reload) without contacting any provider
+shared_report_id = st.query_params.get('report_id')
+if shared_report_id and shared_report_id != st.session_state.get('report_id'):
+    stored_report = report_store.get(shared_report_id)
+    st.session_state.report_id = shared_report_id
+    if stored_report:
+        st.session_state.mock_results = results_from_report(stored_report['report'])
+        st.session_state.report_meta = stored_report['metadata']
+        st.session_state.analysis_complete = True
+    else:
+        st.warning(f"⚠️ Report {shared_report_id} was not found")
 
 # Sidebar - Property Information
 with st.sidebar:
@@ -685,18 +754,20 @@ with st.sidebar:
     st.header(get_text(lang, 'sidebar_title'))
     property_id = st.text_input(
         "Property ID",
-        value=f"PROP-{datetime.now().strftime('%Y%m%d-%H%M')}",
+        value=st.session_state.report_meta.get('property_id') or f"PROP-{datetime.now().strftime('%Y%m%d-%H%M')}",
         help="Unique identifier for this property"
     )
     
     property_address = st.text_area(
         "Property Address",
+        value=st.session_state.report_meta.get('property_address', ''),
         placeholder="Enter full address...",
         height=80
     )
     
-    inspector_name = st.text_input("Inspector Name", value="Demo Inspector")
-    inspection_date = st.date_input("Inspection Date", value=datetime.now())
+    inspector_name = st.text_input("Inspector Name", value=st.session_state.report_meta.get('inspector_name', "Demo Inspector"))
+    shared_date = st.session_state.report_meta.get('inspection_date')
+    inspection_date = st.date_input("Inspection Date", value=date.fromisoformat(shared_date) if shared_date else datetime.now())
     
     st.markdown("---")
     
@@ -743,21 +814,26 @@ with st.sidebar:
                 st.rerun()
         
         if ask_button and user_question:
-            with st.spinner("🤔 Thinking..."):
-                # Initialize ChatAgent
-                chat_agent = ChatAgent()
-                
-                # Get response
-                response = chat_agent.chat(
+            chat_agent = get_chat_agent()
+            
+            # Stream the response token by token; the box is cleared once it lands in the history below
+            chat_timings = {}
+            stream_box = st.empty()
+            with stream_box.container():
+                st.markdown("**AI:**")
+                response = st.write_stream(chat_agent.stream_chat(
                     user_question,
                     st.session_state.mock_results,
                     st.session_state.chat_history,
-                    current_lang
-                )
-                
-                # Add to history
-                st.session_state.chat_history.append({"role": "user", "content": user_question})
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
+                    current_lang,
+                    timings=chat_timings
+                ))
+            stream_box.empty()
+            st.session_state.last_chat_timings = chat_timings
+            
+            # Add to history
+            st.session_state.chat_history.append({"role": "user", "content": user_question})
+            st.session_state.chat_history.append({"role": "assistant", "content": response})
         
         # Display chat history (last 6 messages = 3 exchanges)
         if st.session_state.chat_history:
@@ -778,6 +854,12 @@ with st.sidebar:
                         <span style='color: #cbd5e1;'>{msg['content']}</span>
                     </div>
                     """, unsafe_allow_html=True)
+            
+            # Latency of the most recent answer: first token vs. full response
+            last_timings = st.session_state.get('last_chat_timings')
+            if last_timings and last_timings.get('time_to_first_token') is not None:
+                st.caption(f"⚡ First token in {last_timings['time_to_first_token']:.2f}s • "
+                           f"full answer in {last_timings['total_time']:.2f}s")
     else:
         st.info("Complete an analysis to chat with AI assistant")
     
@@ -854,9 +936,9 @@ with tab1:
         cols = st.columns(4)
         for idx, uploaded_file in enumerate(uploaded_files):
             with cols[idx % 4]:
-                image = Image.open(uploaded_file)
                 st.markdown(f'<div class="image-card">', unsafe_allow_html=True)
-                st.image(image, caption=f"Image {idx+1}", use_container_width=True)
+                thumbnail = get_thumbnail(upload_hash(uploaded_file), uploaded_file.getvalue())
+                st.image(thumbnail or uploaded_file, caption=f"Image {idx+1}", use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
                 
         st.markdown("---")
@@ -866,66 +948,13 @@ with tab1:
         
         with col_btn:
             if st.button("🚀 Start AI-Powered Analysis", type="primary", use_container_width=True):
-                with st.spinner(""):
-                    st.markdown("""
-                    <div class="info-box pulse">
-                        🤖 <strong>AI Vision Agent</strong> is analyzing your images...<br/>
-                        <small>Processing multi-modal data with Multi-Agent System</small>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    steps = [
-                        "🔍 Vision Agent analyzing images...",
-                        "⚖️ Compliance Agent checking IRC codes...",
-                        "💰 Finance Agent calculating costs...",
-                        "📊 Generating comprehensive report..."
-                    ]
-                    
-                    for i in range(100):
-                        time.sleep(0.02)
-                        progress_bar.progress(i + 1)
-                        if i % 25 == 0 and i < 100:
-                            status_text.markdown(f"**{steps[i // 25]}**")
-                    
-                    # Actually process with agents
-                    report = orchestrator.process_inspection(uploaded_files, inspector_notes)
-                    
-                    # Store real results from multi-agent system
-                    st.session_state.mock_results = {
-                        'total_defects': report.get('total_defects', 0),
-                        'high_risk': report.get('high_risk', 0),
-                        'medium_risk': report.get('medium_risk', 0),
-                        'low_risk': report.get('low_risk', 0),
-                        'estimated_cost': report.get('total_cost', 0),
-                        'risk_score': report.get('risk_score', 0),
-                        'compliance_violations': report.get('compliance_violations', 0),
-                        'compliance_reviews': report.get('compliance_reviews', 0),
-                        'defects': [
-                            {
-                                'type': d['type'],
-                                'severity': d['severity'],
-                                'location': d['location'],
-                                'confidence': d['confidence'],
-                                'cost': d['estimated_cost'],
-                                'irc_code': d.get('irc_code', ''),
-                                'description': d.get('description', '')
-                            }
-                            for d in report.get('all_defects', [])
-                        ],
-                        'violations': report.get('violations', []),
-                        'rag_references': report.get('rag_references', []),
-                        'recommendations': report.get('recommendations', [])
-                    }
-                    st.session_state.analysis_complete = True
-                    
-                st.markdown("""
-                <div class="success-box">
-                    ✅ <strong>Analysis Complete!</strong> View comprehensive results in the Analysis Dashboard tab
-                </div>
-                """, unsafe_allow_html=True)
+                # Queue the inspection; a worker process runs it even if this page reruns
+                st.session_state.active_job = job_queue.submit(
+                    uploaded_files, inspector_notes,
+                    {"property_id": property_id, "inspection_date": str(inspection_date),
+                     "property_address": property_address, "inspector_name": inspector_name}
+                )
+                st.session_state.analysis_complete = False
     else:
         st.markdown("""
         <div class="info-box" style="text-align: center; padding: 3rem;">
@@ -933,6 +962,109 @@ with tab1:
             <p style="color: #64748b;">Our AI-powered analysis will identify defects, assess risks, and estimate repair costs</p>
         </div>
         """, unsafe_allow_html=True)
+    
+    # Progress of the active job is polled in a fragment, so the other tabs render while it runs
+    @st.fragment(run_every=0.5)
+    def show_active_job(job_id):
+        job = job_queue.status(job_id)
+        if job is None or job["status"] in (DONE, FAILED):
+            if job is None:
+                # e.g. SAFENEST_JOBS_DB changed or the queue database was cleared
+                outcome = ("failed", f"Job {job_id} is no longer in the job queue - please start the analysis again")
+            elif job["status"] == DONE:
+                # Store real results from multi-agent system
+                st.session_state.mock_results = results_from_report(job_queue.report(job_id))
+                st.session_state.analysis_complete = True
+                # The worker stored the report under the job ID; keep it in the URL so a reload reopens it
+                st.session_state.report_id = job_id
+                st.query_params['report_id'] = job_id
+                outcome = ("done", None)
+            else:
+                outcome = ("failed", job["error"])
+            st.session_state.active_job = None
+            st.session_state.job_outcome = outcome
+            st.rerun()
+        
+        st.markdown("""
+        <div class="info-box pulse">
+            🤖 <strong>AI Vision Agent</strong> is analyzing your images...<br/>
+            <small>Processing multi-modal data with Multi-Agent System</small>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        
+        def show_progress(update):
+            """Drive the progress bar from real pipeline events"""
+            stage = update["stage"]
+            counter = f"({update['images_done']}/{update['images_total']} images done)"
+            if stage == "image_started":
+                status_text.markdown(f"**🔍 Vision Agent analyzing {update['image_name']}... {counter}**")
+            elif stage == "provider_responded":
+                status_text.markdown(f"**🤖 {update['provider']} responded for {update['image_name']} {counter}**")
+            elif stage == "image_finished":
+                status_text.markdown(f"**✅ Finished {update['image_name']} {counter}**")
+            elif stage == "compliance_done":
+                status_text.markdown("**⚖️ Compliance Agent checked IRC codes - 💰 Finance Agent calculating costs...**")
+            elif stage == "finance_done":
+                status_text.markdown("**📊 Comprehensive report generated**")
+            progress_bar.progress(min(int(update["progress"] * 100), 100))
+        
+        def show_event(event):
+            """Show one analyzed image as soon as its worker reports it"""
+            totals = event["totals"]
+            image_defects = event["defects"]
+            high_count = sum(1 for d in image_defects if d.get("severity") == "High")
+            if event.get("error"):
+                st.markdown(f"""
+                <div class="error-box">
+                    ❌ <strong>{event['image_name']}</strong> could not be analyzed<br/>
+                    <small>{event['error']}</small>
+                </div>
+                """, unsafe_allow_html=True)
+            elif event.get("duplicate_of"):
+                st.markdown(f"""
+                <div class="info-box">
+                    🪞 <strong>{event['image_name']}</strong> ({totals['images_done']}/{totals['images_total']}):
+                    near-duplicate of {event['duplicate_of']} - reused its {len(image_defects)} defect(s)
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                st.markdown(f"""
+                <div class="info-box">
+                    📷 <strong>{event['image_name']}</strong> ({totals['images_done']}/{totals['images_total']}):
+                    {len(image_defects)} defect(s), {high_count} high risk, 
+                    {len(event['compliance']['violations'])} IRC match(es)<br/>
+                    <small>Running total: {totals['defects']} defect(s) • ₹{totals['estimated_cost']:,} estimated</small>
+                </div>
+                """, unsafe_allow_html=True)
+        
+        # Every run replays the events recorded so far, so reruns pick up where the job is
+        for _, event in job_queue.events(job_id):
+            show_event(event)
+        if job["progress"]:
+            show_progress(job["progress"])
+        elif job["status"] == "queued":
+            status_text.markdown(f"**⏳ Waiting for a free inspection worker ({worker_pool.alive()} running)...**")
+    
+    job_outcome = st.session_state.pop('job_outcome', None)
+    if job_outcome and job_outcome[0] == "done":
+        st.markdown("""
+        <div class="success-box">
+            ✅ <strong>Analysis Complete!</strong> View comprehensive results in the Analysis Dashboard tab
+        </div>
+        """, unsafe_allow_html=True)
+    elif job_outcome:
+        st.markdown(f"""
+        <div class="error-box">
+            ❌ <strong>Analysis failed</strong><br/>
+            <small>{job_outcome[1]}</small>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if st.session_state.get('active_job'):
+        show_active_job(st.session_state.active_job)
 
 # TAB 2: Analysis Dashboard
 with tab2:
@@ -941,6 +1073,10 @@ with tab2:
     if st.session_state.analysis_complete and st.session_state.mock_results:
         results = st.session_state.mock_results
         
+        # Dataframe and charting libraries are only loaded once there are results to render
+        import pandas as pd
+        import plotly.express as px
+        
         # Premium Metrics Display
         st.markdown("### 🎯 Property Health Metrics")
         
@@ -1525,9 +1661,13 @@ For full report details, please access the SafeNest AI platform.
         
         with col3:
             if st.button("🔗 Share Report Link", use_container_width=True, type="primary"):
-                share_link = f"http://localhost:8502/?report_id={property_id}"
-                st.code(share_link, language=None)
-                st.info("🔗 Report link generated! Copy the link above to share.")
+                if st.session_state.get('report_id'):
+                    public_url = os.getenv('SAFENEST_PUBLIC_URL', 'http://localhost:8501').rstrip('/')
+                    share_link = f"{public_url}/?report_id={st.session_state.report_id}"
+                    st.code(share_link, language=None)
+                    st.info("🔗 Report link generated! Copy the link above to share.")
+                else:
+                    st.warning("⚠️ This report was not saved, so it cannot be shared")
                 
                 
     else:
@@ -1545,6 +1685,9 @@ with tab4:
     if st.session_state.analysis_complete:
         results = st.session_state.mock_results
         
+        import pandas as pd
+        import plotly.express as px
+        
         st.markdown("### 💵 Total Estimated Repair Investment")
         st.markdown(f"""
         <div class="metric-card" style="max-width: 600px; margin: 0 auto;">
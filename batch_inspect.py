@@ -0,0 +1,203 @@
+# batch_inspect.py - Headless batch inspections over a directory or manifest of properties
+import argparse
+import csv
+import io
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from safenest import AgentOrchestrator
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+
+
+def discover_properties(source):
+    """List of {"property_id", "images", "notes"} from a directory or a .json/.jsonl/.csv manifest.
+
+    In a directory every sub-directory with images is one property (images directly inside the
+    directory form a property named after it); an optional notes.txt holds the inspector notes.
+    Manifest image paths are relative to the manifest's directory.
+    """
+    source = Path(source)
+    if source.is_dir():
+        properties = []
+        for folder in [source] + sorted(p for p in source.iterdir() if p.is_dir()):
+            images = sorted(p for p in folder.iterdir() if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+            if images:
+                notes_path = folder / "notes.txt"
+                notes = notes_path.read_text().strip() if notes_path.exists() else ""
+                properties.append({"property_id": folder.name, "images": images, "notes": notes})
+        return properties
+
+    base = source.parent
+    suffix = source.suffix.lower()
+    if suffix == ".csv":
+        # One row per image: property_id, image[, notes]
+        grouped = {}
+        with open(source, newline="") as f:
+            for row in csv.DictReader(f):
+                entry = grouped.setdefault(row["property_id"], {"property_id": row["property_id"], "images": [], "notes": ""})
+                entry["images"].append(row["image"])
+                entry["notes"] = entry["notes"] or (row.get("notes") or "").strip()
+        entries = list(grouped.values())
+    elif suffix == ".jsonl":
+        with open(source) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    elif suffix == ".json":
+        with open(source) as f:
+            data = json.load(f)
+        entries = data.get("properties", []) if isinstance(data, dict) else data
+    else:
+        raise ValueError(f"Unsupported manifest format: {source} (use a directory, .json, .jsonl or .csv)")
+
+    return [{
+        "property_id": str(entry.get("property_id") or entry.get("id")),
+        "images": [base / image for image in entry.get("images", [])],
+        "notes": entry.get("notes", "")
+    } for entry in entries]
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class BatchRunner:
+    """Runs inspections for many properties through one shared AgentOrchestrator"""
+
+    def __init__(self, output_dir, output_format="json", properties_in_flight=2, image_workers=None):
+        self.output_dir = Path(output_dir)
+        self.output_format = output_format
+        self.properties_in_flight = properties_in_flight
+        # The orchestrator's image pool is shared by every property, so it bounds total image concurrency
+        self.orchestrator = AgentOrchestrator(max_workers=image_workers)
+        self.latencies = []
+        self.images = 0
+        self.failed_images = 0
+        self.duplicate_images = 0
+        self.failed_properties = 0
+        self._lock = threading.Lock()
+
+    def _inspect(self, prop):
+        """Inspect one property; returns its report with per-image errors attached"""
+        uploads = []
+        for path in prop["images"]:
+            upload = io.BytesIO(Path(path).read_bytes())
+            upload.name = Path(path).name
+            uploads.append(upload)
+
+        report, errors = None, []
+        for event in self.orchestrator.iter_inspection(uploads, prop["notes"]):
+            if event["event"] == "image":
+                with self._lock:
+                    self.images += 1
+                    if "error" in event:
+                        self.failed_images += 1
+                        errors.append({"image_name": event["image_name"], "error": event["error"]})
+                    elif "duplicate_of" in event:
+                        self.duplicate_images += 1
+                    else:
+                        self.latencies.append(event["image_stats"]["elapsed"])
+            else:
+                report = event["report"]
+
+        report["property_id"] = prop["property_id"]
+        report["image_errors"] = errors
+        return report
+
+    def _write(self, prop_id, report, jsonl_file):
+        if jsonl_file:
+            jsonl_file.write(json.dumps(report, default=str) + "\n")
+            jsonl_file.flush()
+        else:
+            safe_name = re.sub(r"[^A-Za-z0-9._-]+", "_", prop_id)
+            with open(self.output_dir / f"{safe_name}.json", "w") as f:
+                json.dump(report, f, indent=2, default=str)
+
+    def run(self, properties):
+        """Inspect every property, writing each report as soon as it completes"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        jsonl_file = open(self.output_dir / "reports.jsonl", "a") if self.output_format == "jsonl" else None
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.properties_in_flight, thread_name_prefix="batch-property") as pool:
+                futures = {pool.submit(self._inspect, prop): prop["property_id"] for prop in properties}
+                for done, future in enumerate(as_completed(futures), 1):
+                    prop_id = futures[future]
+                    try:
+                        report = future.result()
+                    except Exception as e:
+                        self.failed_properties += 1
+                        print(f"❌ [{done}/{len(futures)}] {prop_id}: {e}")
+                        continue
+                    self._write(prop_id, report, jsonl_file)
+                    print(f"✅ [{done}/{len(futures)}] {prop_id}: {report['total_defects']} defects, "
+                          f"risk {report['risk_score']}, ₹{report['total_cost']:,}")
+        finally:
+            if jsonl_file:
+                jsonl_file.close()
+        return self.stats(time.perf_counter() - started, len(properties))
+
+    def stats(self, elapsed, total_properties):
+        """Throughput and per-image latency summary"""
+        stats = {
+            "properties": total_properties,
+            "failed_properties": self.failed_properties,
+            "images": self.images,
+            "failed_images": self.failed_images,
+            "duplicate_images": self.duplicate_images,
+            "elapsed_s": round(elapsed, 2),
+            "images_per_s": round(self.images / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        if self.latencies:
+            stats["p50_image_s"] = _percentile(self.latencies, 50)
+            stats["p95_image_s"] = _percentile(self.latencies, 95)
+        stats["providers"] = self.orchestrator.provider_stats()
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SafeNest inspections for many properties without the UI")
+    parser.add_argument("source", help="Directory of property folders, or a .json/.jsonl/.csv manifest")
+    parser.add_argument("--output", default="reports", help="Directory reports are written to")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json",
+                        help="One JSON file per property, or one line per property in reports.jsonl")
+    parser.add_argument("--properties", type=int, default=2, help="Properties inspected at the same time")
+    parser.add_argument("--image-workers", type=int, default=None,
+                        help="Images analyzed at the same time across all properties (default SAFENEST_IMAGE_WORKERS)")
+    args = parser.parse_args()
+
+    properties = discover_properties(args.source)
+    if not properties:
+        print(f"⚠️ No properties with images found in {args.source}")
+        return
+
+    print(f"🏠 Inspecting {len(properties)} properties ({sum(len(p['images']) for p in properties)} images)")
+    runner = BatchRunner(args.output, args.format, args.properties, args.image_workers)
+    stats = runner.run(properties)
+
+    print(f"\n📊 {stats['images']} images from {stats['properties']} properties in {stats['elapsed_s']}s "
+          f"({stats['images_per_s']} images/s)")
+    if stats["duplicate_images"]:
+        print(f"🪞 {stats['duplicate_images']} near-duplicate images reused another image's analysis")
+    if "p50_image_s" in stats:
+        print(f"⏱️ Per-image latency: p50 {stats['p50_image_s']:.2f}s, p95 {stats['p95_image_s']:.2f}s")
+    for provider, p in stats["providers"].items():
+        if p["p50_s"] is not None:
+            print(f"📡 {provider}: p50 {p['p50_s']:.2f}s, p95 {p['p95_s']:.2f}s, "
+                  f"{100 * p['error_rate']:.0f}% errors over the last {p['samples']} calls")
+        if p["throttled"] or p["retries"] or p["short_circuited"] or p["breaker_opens"] or p["deadline_giveups"]:
+            print(f"🚦 {provider}: {p['throttled']} throttled ({p['throttle_wait_s']}s waiting), {p['retries']} retries, "
+                  f"{p['breaker_opens']} breaker opens, {p['short_circuited']} calls skipped while open, "
+                  f"{p['deadline_giveups']} retries dropped at the image deadline")
+    if stats["failed_images"] or stats["failed_properties"]:
+        print(f"⚠️ {stats['failed_images']} images and {stats['failed_properties']} properties failed")
+
+
+if __name__ == "__main__":
+    main()
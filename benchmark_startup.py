@@ -0,0 +1,81 @@
+# benchmark_startup.py - Time the first render of the Streamlit app in fresh processes
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# Libraries the app should only load once there are results to chart
+HEAVY_MODULES = ("pandas", "plotly.express", "pyarrow")
+
+# Runs in a fresh interpreter so every measurement pays the cold import cost; Streamlit itself is
+# imported before the clock starts because every version of the app pays for it equally
+_FIRST_PAINT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+at = AppTest.from_file({script!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "errors": len(at.exception),
+                   "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(script, runs):
+    """First-render timings of one app script, one fresh process per run"""
+    samples, loaded, errors = [], set(), 0
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _FIRST_PAINT.format(script=str(script), heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded.update(result["loaded"])
+        errors += result["errors"]
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "loaded": sorted(loaded),
+        "errors": errors
+    }
+
+
+def _print(label, stats):
+    loaded = ", ".join(stats["loaded"]) or "none"
+    print(f"{label:>10}: median {stats['median_s'] * 1000:.0f} ms, min {stats['min_s'] * 1000:.0f} ms "
+          f"(heavy modules loaded: {loaded})")
+    if stats["errors"]:
+        print(f"⚠️ {label} raised {stats['errors']} exception(s) while rendering")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the first render of app.py")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--baseline", metavar="GIT_REV",
+                        help="Also time app.py as of this git revision (e.g. HEAD~1) and report the gain")
+    args = parser.parse_args()
+
+    current = measure(ROOT / "app.py", args.runs)
+    _print("current", current)
+
+    if args.baseline:
+        # The old script sits next to app.py so its imports resolve the same way
+        baseline_path = ROOT / f".app_baseline_{args.baseline.replace('/', '_').replace('~', '_')}.py"
+        source = subprocess.run(["git", "show", f"{args.baseline}:app.py"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        baseline_path.write_text(source)
+        try:
+            baseline = measure(baseline_path, args.runs)
+        finally:
+            baseline_path.unlink()
+        _print(args.baseline, baseline)
+        saved = baseline["median_s"] - current["median_s"]
+        print(f"\n⚡ First render is {saved * 1000:.0f} ms faster ({100 * saved / baseline['median_s']:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# build_knowledge_base.py - Compile irc_knowledge_base.json into the runtime storage formats
+import argparse
+
+from safenest.knowledge import (
+    DEFAULT_JURISDICTION, KB_COMPILED_PATH, KB_JSON_PATH, KB_SQLITE_PATH,
+    CompiledCodeStore, compile_knowledge_base, import_knowledge_base_to_sqlite
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the IRC knowledge base for fast loading")
+    parser.add_argument("--json", default=str(KB_JSON_PATH), help="Source knowledge base JSON")
+    parser.add_argument("--output", default=str(KB_COMPILED_PATH), help="Compiled output file")
+    parser.add_argument("--sqlite", nargs="?", const=str(KB_SQLITE_PATH), default=None,
+                        help="Import into the SQLite/FTS5 store instead (optionally give the database path)")
+    parser.add_argument("--jurisdiction", default=DEFAULT_JURISDICTION,
+                        help="Jurisdiction the imported codes belong to (SQLite store only)")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        count = import_knowledge_base_to_sqlite(args.json, args.sqlite, args.jurisdiction)
+        print(f"✅ Imported {count} sections into {args.sqlite} as jurisdiction {args.jurisdiction}")
+        return
+
+    output_path = compile_knowledge_base(args.json, args.output)
+    store = CompiledCodeStore(output_path)
+    print(f"✅ Compiled {len(store)} sections into {output_path} ({output_path.stat().st_size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# safenest/__init__.py - UI-free core of SafeNest AI: agents, knowledge base and inspection pipeline
+#
+# Submodules are imported on first attribute access, so `from safenest import FinanceAgent` only
+# loads what that agent needs. Provider SDKs (openai, requests, httpx) and the heavy numeric and
+# imaging libraries (numpy, pandas, Pillow) are imported inside the code paths that use them.
+import importlib
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+_EXPORTS = {
+    "tokenize": "text",
+    "KB_JSON_PATH": "knowledge",
+    "KB_COMPILED_PATH": "knowledge",
+    "KB_SQLITE_PATH": "knowledge",
+    "DEFAULT_JURISDICTION": "knowledge",
+    "compile_knowledge_base": "knowledge",
+    "import_knowledge_base_to_sqlite": "knowledge",
+    "CompiledCodeStore": "knowledge",
+    "SQLiteCodeStore": "knowledge",
+    "IRCKnowledgeBase": "knowledge",
+    "BM25Ranker": "ranking",
+    "ImagePreprocessor": "imaging",
+    "VISION_PROMPT_VERSION": "cache",
+    "VisionResultCache": "cache",
+    "get_openai_client": "clients",
+    "ProviderGuard": "resilience",
+    "get_provider_guard": "resilience",
+    "provider_stats": "resilience",
+    "VisionAgent": "vision",
+    "ComplianceAgent": "compliance",
+    "FinanceAgent": "finance",
+    "AgentOrchestrator": "orchestrator",
+    "ChatAgent": "chat",
+    "ReportStore": "reports",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'safenest' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
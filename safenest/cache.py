@@ -0,0 +1,100 @@
+# safenest/cache.py - On-disk cache of vision provider results
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+# Bump whenever the vision prompts change so cached results from old prompts are ignored
+VISION_PROMPT_VERSION = "1"
+
+
+class VisionResultCache:
+    """Disk-backed LRU cache of cleaned per-provider defect lists"""
+    
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = Path(cache_dir or os.getenv('SAFENEST_CACHE_DIR') or Path(__file__).resolve().parent.parent / ".cache" / "vision")
+        self.max_bytes = max_bytes or int(float(os.getenv('SAFENEST_CACHE_MAX_MB', '64')) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._total_bytes = sum(entry.stat().st_size for entry in self.cache_dir.glob("*.json"))
+            self.enabled = True
+        except OSError as e:
+            print(f"Warning: Vision cache disabled ({e})")
+            self._total_bytes = 0
+            self.enabled = False
+    
+    @staticmethod
+    def make_key(image_hash, notes, provider, model):
+        """Content address: image bytes + inspector notes + provider/model + prompt version"""
+        raw = json.dumps([image_hash, notes or "", provider, model, VISION_PROMPT_VERSION])
+        return hashlib.sha256(raw.encode()).hexdigest()
+    
+    def get(self, key):
+        """Return the cached defect list for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self.cache_dir / f"{key}.json"
+        try:
+            with open(path, 'r') as f:
+                defects = json.load(f)
+            os.utime(path)  # Mark as recently used for LRU eviction
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return defects
+    
+    def put(self, key, defects):
+        """Store a defect list and evict least-recently-used entries over the size budget"""
+        if not self.enabled:
+            return
+        path = self.cache_dir / f"{key}.json"
+        data = json.dumps(defects).encode()
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        with self._lock:
+            try:
+                old_size = path.stat().st_size if path.exists() else 0
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+                self._total_bytes += len(data) - old_size
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+            except OSError as e:
+                print(f"Warning: Could not write vision cache entry: {e}")
+    
+    def _evict(self):
+        """Delete oldest entries until the cache fits in max_bytes (caller holds the lock)"""
+        entries = []
+        for entry in self.cache_dir.glob("*.json"):
+            try:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry))
+            except OSError:
+                continue
+        entries.sort(key=lambda e: e[0])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+                self._total_bytes -= size
+            except OSError:
+                continue
+    
+    def stats(self):
+        """Hit/miss counters and current disk usage"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "bytes": self._total_bytes
+            }
@@ -0,0 +1,155 @@
+# safenest/chat.py - Inspection Q&A chatbot
+import os
+import time
+
+from .clients import OPENAI_AVAILABLE, get_openai_client
+from .resilience import get_provider_guard
+
+
+class ChatAgent:
+    """AI-powered chatbot for property inspection questions"""
+    
+    def __init__(self, openai_api_key=None):
+        self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
+        if self.openai_api_key and OPENAI_AVAILABLE:
+            self.client = get_openai_client(self.openai_api_key)
+        elif self.openai_api_key and not OPENAI_AVAILABLE:
+            self.client = None
+            print("WARNING: OpenAI library not installed for ChatAgent")
+        else:
+            self.client = None
+            print("WARNING: No OpenAI API key found for ChatAgent")
+        self.model = "gpt-4o-mini"
+        # Shares the vision agent's OpenAI quota and circuit breaker
+        self.guard = get_provider_guard("OpenAI")
+    
+    def _create(self, **kwargs):
+        """chat.completions.create under the OpenAI rate limit, with retries on transient errors"""
+        import openai
+        
+        return self.guard.call(self.client.with_options(max_retries=0).chat.completions.create,
+                               retry_on=(openai.APIConnectionError, openai.APIStatusError), **kwargs)
+    
+    def chat(self, user_message, analysis_context, chat_history=None, language='en', timings=None):
+        """Generate chatbot response based on analysis context
+        
+        If a timings dict is passed it is filled with time_to_first_token and total_time (seconds).
+        """
+        if not self.client:
+            return "❌ Chatbot unavailable. Please set OPENAI_API_KEY environment variable."
+        
+        started = time.perf_counter()
+        try:
+            # Call OpenAI
+            response = self._create(
+                model=self.model,
+                messages=self._build_messages(user_message, analysis_context, chat_history),
+                temperature=0.7,
+                max_tokens=250
+            )
+            
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            print(f"ChatAgent error: {e}")
+            return f"❌ Sorry, I encountered an error: {str(e)}"
+        finally:
+            if timings is not None:
+                # Without streaming the first token arrives with the whole answer
+                timings["total_time"] = time.perf_counter() - started
+                timings["time_to_first_token"] = timings["total_time"]
+    
+    def stream_chat(self, user_message, analysis_context, chat_history=None, language='en', timings=None):
+        """Streaming variant of chat: yields response text as tokens arrive
+        
+        If a timings dict is passed it is filled with time_to_first_token and total_time (seconds)
+        once the stream is exhausted.
+        """
+        if not self.client:
+            yield "❌ Chatbot unavailable. Please set OPENAI_API_KEY environment variable."
+            return
+        
+        started = time.perf_counter()
+        first_token_at = None
+        try:
+            # Only opening the stream is retried; tokens already shown are never repeated
+            stream = self._create(
+                model=self.model,
+                messages=self._build_messages(user_message, analysis_context, chat_history),
+                temperature=0.7,
+                max_tokens=250,
+                stream=True
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield token
+                    
+        except Exception as e:
+            print(f"ChatAgent error: {e}")
+            yield f"❌ Sorry, I encountered an error: {str(e)}"
+        finally:
+            if timings is not None:
+                timings["time_to_first_token"] = first_token_at - started if first_token_at else None
+                timings["total_time"] = time.perf_counter() - started
+    
+    def _build_messages(self, user_message, analysis_context, chat_history=None):
+        """System context from the analysis, then prior turns, then the new question"""
+        # Build context from analysis results
+        defects_summary = self._format_defects(analysis_context.get('defects', []))
+        
+        context = f"""You are a helpful property inspection assistant. Answer questions about this property inspection in a clear, professional, and friendly manner.
+
+PROPERTY INSPECTION SUMMARY:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Risk Score: {analysis_context.get('risk_score', 'N/A')}/100
+Total Defects Found: {analysis_context.get('total_defects', 0)}
+High Risk Issues: {analysis_context.get('high_risk', 0)}
+Medium Risk Issues: {analysis_context.get('medium_risk', 0)}
+Low Risk Issues: {analysis_context.get('low_risk', 0)}
+Estimated Repair Cost: ₹{analysis_context.get('total_cost', 0):,}
+
+DETECTED DEFECTS:
+{defects_summary}
+
+INSTRUCTIONS:
+- Answer questions clearly and concisely
+- Provide specific recommendations when asked
+- Reference the actual defects found in the inspection
+- Be helpful and professional
+- If asked about costs, use the estimated costs from the analysis
+- If asked about urgency, reference the severity levels
+- Keep responses under 150 words unless more detail is specifically requested
+"""
+        
+        # Build messages
+        messages = [{"role": "system", "content": context}]
+        
+        # Add chat history if provided
+        if chat_history:
+            messages.extend(chat_history)
+        
+        # Add user message
+        messages.append({"role": "user", "content": user_message})
+        
+        return messages
+    
+    def _format_defects(self, defects):
+        """Format defects for context"""
+        if not defects:
+            return "No defects found."
+        
+        formatted = []
+        for idx, defect in enumerate(defects, 1):
+            formatted.append(f"""
+{idx}. {defect.get('type', 'Unknown')} ({defect.get('severity', 'Unknown')} Severity)
+   Location: {defect.get('location', 'Unknown')}
+   Cost: ₹{defect.get('cost', 0):,}
+   Description: {defect.get('description', 'N/A')}
+""")
+        
+        return "\n".join(formatted)
@@ -0,0 +1,21 @@
+# safenest/clients.py - Shared provider SDK clients, imported on first use
+import importlib.util
+import threading
+
+# Checked without importing the SDK, which is only loaded when a client is first created
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
+
+# One OpenAI client (and its keep-alive connection pool) per API key, shared by every agent
+_openai_clients = {}
+_openai_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key):
+    """Process-wide OpenAI client for api_key; the SDK client is safe to share between threads"""
+    with _openai_clients_lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=api_key)
+            _openai_clients[api_key] = client
+        return client
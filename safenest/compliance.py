@@ -0,0 +1,156 @@
+# safenest/compliance.py - RAG compliance checks of detected defects against the IRC
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+
+from .knowledge import IRCKnowledgeBase
+from .text import _score_to_confidence
+
+# NumPy backs the vectorized BM25 code ranking; safenest.ranking is only imported when it is needed
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+
+class ComplianceAgent:
+    """Enhanced RAG-based compliance checker"""
+    
+    def __init__(self, memo_size=None):
+        self.knowledge_base = IRCKnowledgeBase()
+        self._ranker = None
+        self._ranker_lock = threading.Lock()
+        
+        # Bounded LRU of resolved (irc_code, defect type) lookups, shared across inspections
+        self.memo_size = memo_size or int(os.getenv('SAFENEST_COMPLIANCE_MEMO_SIZE', '4096'))
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.memo_hits = 0
+        self.memo_misses = 0
+    
+    @property
+    def ranker(self):
+        """BM25 ranker, built on first use so exact code lookups never decode the whole knowledge base
+        
+        Stores with their own full-text search (SQLite) are queried through search_by_violation instead.
+        """
+        if self._ranker is None and NUMPY_AVAILABLE and not hasattr(self.knowledge_base.codes, "search"):
+            with self._ranker_lock:
+                if self._ranker is None:
+                    from .ranking import BM25Ranker
+                    self._ranker = BM25Ranker(self.knowledge_base)
+        return self._ranker
+    
+    @staticmethod
+    def _lookup_key(defect):
+        """(irc_code, defect type) memo key; the code keeps its exact spelling, as retrieve_code matches it verbatim"""
+        irc_code = str(defect.get("irc_code") or "")
+        defect_type = " ".join(str(defect.get("type", "")).lower().split())
+        return irc_code, defect_type
+    
+    def _resolve(self, keys):
+        """Resolve distinct lookup keys to ("code", code_info), ("match", code_match) or None"""
+        resolved = {}
+        unmatched = []
+        for key in keys:
+            code_info = self.knowledge_base.retrieve_code(key[0]) if key[0] else None
+            if code_info:
+                resolved[key] = ("code", code_info)
+            else:
+                unmatched.append(key)
+        
+        # Defects without an exact code are ranked against the whole knowledge base in one batch
+        ranked = self.ranker.rank([key[1] for key in unmatched], k=2) if self.ranker and unmatched else []
+        for pos, key in enumerate(unmatched):
+            # Fallback: BM25 retrieval over the code text, then the keyword index
+            matched_codes = (ranked[pos] if pos < len(ranked) else None) or self.knowledge_base.search_by_violation(key[1])
+            resolved[key] = ("match", matched_codes[0]) if matched_codes else None
+        return resolved
+    
+    def _lookup_many(self, defects):
+        """Memoized lookups for a batch of defects; each distinct key is resolved at most once"""
+        keys = [self._lookup_key(defect) for defect in defects]
+        results = {}
+        with self._memo_lock:
+            for key in dict.fromkeys(keys):
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    results[key] = self._memo[key]
+            # Only the first occurrence of an unresolved key is a miss; repeats reuse its resolution
+            misses = sum(1 for key in dict.fromkeys(keys) if key not in results)
+            self.memo_hits += len(keys) - misses
+            self.memo_misses += misses
+        
+        missing = [key for key in dict.fromkeys(keys) if key not in results]
+        if missing:
+            resolved = self._resolve(missing)
+            results.update(resolved)
+            with self._memo_lock:
+                self._memo.update(resolved)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return [results[key] for key in keys]
+    
+    def memo_stats(self):
+        """Hit/miss counters and current size of the lookup memo"""
+        with self._memo_lock:
+            total = self.memo_hits + self.memo_misses
+            return {
+                "hits": self.memo_hits,
+                "misses": self.memo_misses,
+                "hit_rate": self.memo_hits / total if total else 0.0,
+                "size": len(self._memo),
+                "max_size": self.memo_size
+            }
+    
+    def check_compliance(self, defects):
+        """Check compliance using RAG system"""
+        violations = []
+        rag_references = []
+        
+        # RAG: Retrieve IRC code information, memoized per distinct (code, defect type)
+        lookups = self._lookup_many(defects)
+        
+        for defect, lookup in zip(defects, lookups):
+            if lookup is None:
+                continue
+            kind, info = lookup
+            
+            if kind == "code":
+                irc_code = defect.get("irc_code", "")
+                violation_entry = {
+                    "defect": defect["type"],
+                    "location": defect["location"],
+                    "code": irc_code,
+                    "code_title": info.get("title", ""),
+                    "code_description": info.get("description", ""),
+                    "status": "Violation" if defect["severity"] == "High" else "Review Required",
+                    "severity": defect["severity"],
+                    "rag_retrieved": True,
+                    "category": info.get("category", "General")
+                }
+                violations.append(violation_entry)
+                rag_references.append(f"{irc_code}: {info.get('title', '')}")
+            else:
+                if "score" in info:
+                    rag_confidence = _score_to_confidence(info["score"])
+                else:
+                    rag_confidence = info.get("confidence", 0.8)
+                violation_entry = {
+                    "defect": defect["type"],
+                    "location": defect["location"],
+                    "code": info["code"],
+                    "code_title": info.get("title", ""),
+                    "code_description": info.get("description", ""),
+                    "status": "Review Required",
+                    "severity": defect["severity"],
+                    "rag_retrieved": True,
+                    "rag_confidence": rag_confidence,
+                    "category": "Retrieved via RAG"
+                }
+                violations.append(violation_entry)
+        
+        return {
+            "violations": violations,
+            "rag_references": rag_references,
+            "total_violations": len([v for v in violations if v["status"] == "Violation"]),
+            "total_reviews": len([v for v in violations if v["status"] == "Review Required"])
+        }
@@ -0,0 +1,215 @@
+# safenest/finance.py - Risk scoring, cost estimation and report generation
+import importlib.util
+import random
+from datetime import datetime
+
+# pandas backs batch risk scoring over many inspections; imported on first use
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
+
+
+class FinanceAgent:
+    """Enhanced Cost estimation and report generation"""
+    
+    # Diminishing-returns points per defect by severity: (first defect, decrease per defect, floor)
+    SEVERITY_POINTS = {"High": (30, 5, 20), "Medium": (15, 3, 8), "Low": (6, 1, 3)}
+    
+    # Structural issues are more serious: bonus points per defect of these types
+    STRUCTURAL_TYPES = ["Structural Crack", "Foundation Settlement", "Roof Damage"]
+    STRUCTURAL_BONUS = 5
+    
+    # Risk score thresholds and the cost multiplier applied below each one
+    COST_MULTIPLIERS = [
+        (30, 1.0),   # Basic repairs
+        (50, 1.1),   # Moderate repairs with coordination
+        (70, 1.25),  # Complex repairs
+    ]
+    MAX_COST_MULTIPLIER = 1.4  # High-risk structural repairs with professional oversight
+    
+    def generate_report(self, defects, compliance_data, rng=None):
+        """Generate comprehensive report with dynamic calculations
+        
+        rng (a random.Random) makes the risk score's random variation reproducible.
+        """
+        
+        # Calculate base total cost
+        base_total_cost = sum(d["estimated_cost"] for d in defects)
+        
+        # Dynamic risk score calculation
+        risk_score = self._calculate_risk_score(defects, rng)
+        
+        # Adjust total cost based on risk score
+        # A higher risk property often requires specialized inspection and higher labor overhead
+        cost_multiplier = self._cost_multiplier(risk_score)
+        
+        total_cost = int(base_total_cost * cost_multiplier)
+        
+        # Categorize defects
+        defects_by_severity = {
+            "high": [d for d in defects if d["severity"] == "High"],
+            "medium": [d for d in defects if d["severity"] == "Medium"],
+            "low": [d for d in defects if d["severity"] == "Low"]
+        }
+        
+        report = {
+            "total_cost": total_cost,
+            "risk_score": risk_score,
+            "total_defects": len(defects),
+            "defects_by_severity": defects_by_severity,
+            "high_risk": len(defects_by_severity["high"]),
+            "medium_risk": len(defects_by_severity["medium"]),
+            "low_risk": len(defects_by_severity["low"]),
+            "compliance_violations": compliance_data.get("total_violations", 0),
+            "compliance_reviews": compliance_data.get("total_reviews", 0),
+            "violations": compliance_data.get("violations", []),
+            "rag_references": compliance_data.get("rag_references", []),
+            "recommendations": self._generate_recommendations(defects, risk_score),
+            "all_defects": defects,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        return report
+    
+    @classmethod
+    def _cost_multiplier(cls, risk_score):
+        """Cost multiplier for a risk score"""
+        for threshold, multiplier in cls.COST_MULTIPLIERS:
+            if risk_score < threshold:
+                return multiplier
+        return cls.MAX_COST_MULTIPLIER
+    
+    def _calculate_risk_score(self, defects, rng=None):
+        """Dynamic risk score based on actual defects with realistic variation"""
+        if not defects:
+            return 10  # Minimal risk if no defects
+        
+        # Check if ALL defects are invalid images (rejected by validation)
+        # This handles both single and multiple invalid image uploads
+        all_invalid = all(d.get("type") == "Image Not Accepted" for d in defects)
+        if all_invalid:
+            return 0  # Zero risk for invalid images (single or multiple)
+        
+        # Base score starts at 0
+        base_score = 0
+        
+        # Count defects by severity
+        high_count = sum(1 for d in defects if d["severity"] == "High")
+        medium_count = sum(1 for d in defects if d["severity"] == "Medium")
+        low_count = sum(1 for d in defects if d["severity"] == "Low")
+        
+        # Weighted scoring with diminishing returns
+        # High 20-30, Medium 8-15 and Low 3-6 points each
+        for severity, count in (("High", high_count), ("Medium", medium_count), ("Low", low_count)):
+            first, step, floor = self.SEVERITY_POINTS[severity]
+            for i in range(count):
+                base_score += max(floor, first - (i * step))
+        
+        # Add confidence-weighted adjustment
+        avg_confidence = sum(d.get("confidence", 0.8) for d in defects) / len(defects)
+        confidence_multiplier = 0.8 + (avg_confidence * 0.4)  # 0.8 to 1.2 range
+        base_score = int(base_score * confidence_multiplier)
+        
+        # Add variation based on defect types (structural issues are more serious)
+        structural_count = sum(1 for d in defects if d["type"] in self.STRUCTURAL_TYPES)
+        base_score += structural_count * self.STRUCTURAL_BONUS
+        
+        # Add small random variation for realism (±3 points)
+        variation = (rng or random).randint(-3, 3)
+        base_score += variation
+        
+        # Ensure score is between 15 and 95 (never perfect, never catastrophic)
+        final_score = max(15, min(95, base_score))
+        
+        return final_score
+    
+    def score_batch(self, defects_table, seed=None):
+        """Risk scores for many inspections at once from a columnar defects table.
+        
+        defects_table is a DataFrame (or anything pandas.DataFrame accepts) with one row per defect and
+        columns inspection_id, severity, type and optionally confidence and estimated_cost. Returns a
+        DataFrame indexed by inspection_id with risk_score and cost_multiplier (plus base_cost and
+        total_cost when estimated_cost is given).
+        
+        With a seed, each inspection's variation is drawn from random.Random(f"{seed}:{inspection_id}"),
+        so scores equal _calculate_risk_score(defects, rng=that generator). Inspections without any
+        defect rows are not in the table and therefore not scored.
+        """
+        if not PANDAS_AVAILABLE:
+            raise ImportError("pandas is required for batch risk scoring")
+        import numpy as np
+        import pandas as pd
+        
+        df = pd.DataFrame(defects_table)
+        if df.empty:
+            return pd.DataFrame(columns=["defects", "risk_score", "cost_multiplier"])
+        df = df.reset_index(drop=True)
+        confidence = df["confidence"] if "confidence" in df else pd.Series(0.8, index=df.index)
+        df["confidence"] = confidence.fillna(0.8).astype(float)
+        groups = df.groupby("inspection_id", sort=False)
+        
+        # Position of each defect among its inspection's defects of the same severity drives the diminishing returns
+        rank = df.groupby(["inspection_id", "severity"], sort=False).cumcount().to_numpy()
+        points = np.zeros(len(df))
+        for severity, (first, step, floor) in self.SEVERITY_POINTS.items():
+            mask = (df["severity"] == severity).to_numpy()
+            points[mask] = np.maximum(floor, first - rank[mask] * step)
+        df["points"] = points
+        df["structural"] = df["type"].isin(self.STRUCTURAL_TYPES)
+        df["invalid"] = df["type"] == "Image Not Accepted"
+        
+        scores = groups.agg(
+            defects=("severity", "size"),
+            points=("points", "sum"),
+            confidence=("confidence", "sum"),
+            structural=("structural", "sum"),
+            all_invalid=("invalid", "all")
+        )
+        scores["avg_confidence"] = scores.pop("confidence") / scores["defects"]
+        confidence_multiplier = 0.8 + scores["avg_confidence"] * 0.4
+        base_score = np.trunc(scores["points"] * confidence_multiplier).astype(int)
+        base_score += scores["structural"].astype(int) * self.STRUCTURAL_BONUS
+        
+        # Add small random variation for realism (±3 points)
+        if seed is None:
+            variation = np.random.default_rng().integers(-3, 4, size=len(scores))
+        else:
+            variation = [random.Random(f"{seed}:{inspection_id}").randint(-3, 3) for inspection_id in scores.index]
+        base_score += np.asarray(variation)
+        
+        risk_score = base_score.clip(15, 95)
+        scores["risk_score"] = risk_score.where(~scores["all_invalid"], 0).astype(int)
+        
+        thresholds = [threshold for threshold, _ in self.COST_MULTIPLIERS]
+        multipliers = [multiplier for _, multiplier in self.COST_MULTIPLIERS] + [self.MAX_COST_MULTIPLIER]
+        scores["cost_multiplier"] = np.take(multipliers, np.searchsorted(thresholds, scores["risk_score"], side="right"))
+        
+        if "estimated_cost" in df:
+            scores["base_cost"] = groups["estimated_cost"].sum()
+            scores["total_cost"] = np.trunc(scores["base_cost"] * scores["cost_multiplier"]).astype(int)
+        
+        return scores.drop(columns=["points", "all_invalid"])
+    
+    def _generate_recommendations(self, defects, risk_score):
+        """Generate dynamic recommendations based on defects and risk score"""
+        recs = []
+        
+        # Add overall risk assessment
+        if risk_score >= 70:
+            recs.append(f"🚨 HIGH RISK PROPERTY (Score: {risk_score}/100) - Immediate professional inspection recommended")
+        elif risk_score >= 50:
+            recs.append(f"⚠️ MODERATE RISK (Score: {risk_score}/100) - Schedule comprehensive repairs within 30 days")
+        else:
+            recs.append(f"ℹ️ LOW-MODERATE RISK (Score: {risk_score}/100) - Routine maintenance and monitoring recommended")
+        
+        high_priority = [d for d in defects if d["severity"] == "High"]
+        for defect in high_priority[:3]:  # Top 3 high priority
+            recs.append(f"🚨 URGENT: Address {defect['type']} at {defect['location']} within 7 days")
+        
+        medium_priority = [d for d in defects if d["severity"] == "Medium"]
+        if medium_priority:
+            recs.append(f"⚠️ Schedule repairs for {len(medium_priority)} medium-priority issue(s) within 30 days")
+        
+        low_priority = [d for d in defects if d["severity"] == "Low"]
+        if low_priority:
+            recs.append(f"ℹ️ Monitor {len(low_priority)} low-priority issue(s) and address during routine maintenance")
+        
+        return recs
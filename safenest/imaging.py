@@ -0,0 +1,183 @@
+# safenest/imaging.py - Upload preprocessing before images are sent to the vision providers
+import importlib.util
+import io
+import os
+
+# Pillow shrinks uploads before they are base64-encoded for the vision providers; imported on first use
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+# NumPy packs the perceptual-hash bits used for near-duplicate detection
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# Thumbnails flatter than this (grayscale standard deviation, 0-255) have no gradients to hash
+MIN_HASH_CONTRAST = 4.0
+
+# EXIF Orientation tag
+EXIF_ORIENTATION = 0x0112
+
+
+def perceptual_hash(img_bytes, hash_size=8):
+    """dHash of an image as an int of hash_size**2 bits, or None if it cannot be decoded or is featureless
+    
+    Each bit records whether a pixel of the grayscale (hash_size + 1) x hash_size thumbnail is
+    brighter than its right-hand neighbour, so re-encoding, resizing and small exposure or framing
+    changes flip only a few bits. A near-uniform thumbnail (a dark room, a plain wall) hashes to
+    almost all zeros whatever it shows, so it gets no hash rather than one that matches every other
+    flat image.
+    """
+    if not (PIL_AVAILABLE and NUMPY_AVAILABLE):
+        return None
+    import numpy as np
+    from PIL import Image, ImageOps
+    
+    try:
+        img = Image.open(io.BytesIO(img_bytes))
+        img.draft("L", (hash_size * 8, hash_size * 8))  # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img).convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    except Exception as e:
+        print(f"  ⚠️ Perceptual hash skipped: {e}")
+        return None
+    pixels = np.asarray(img, dtype=np.int16)
+    if pixels.std() < MIN_HASH_CONTRAST:
+        return None
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two perceptual hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def make_thumbnail(img_bytes, max_edge=480, quality=80):
+    """Small JPEG preview of an upload for display, or None if it cannot be decoded"""
+    if not PIL_AVAILABLE:
+        return None
+    from PIL import Image, ImageOps
+    
+    try:
+        img = Image.open(io.BytesIO(img_bytes))
+        img.draft("RGB", (max_edge, max_edge))  # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=quality)
+    except Exception as e:
+        print(f"  ⚠️ Thumbnail skipped: {e}")
+        return None
+    return buffer.getvalue()
+
+
+class ImagePreprocessor:
+    """Downscale, strip metadata and re-encode uploads as compact JPEG before upload to the providers"""
+    
+    MIN_QUALITY = 40
+    MIN_EDGE = 512
+    
+    def __init__(self, max_edge=None, quality=None, max_kb=None, enabled=True):
+        self.max_edge = max_edge or int(os.getenv('SAFENEST_IMAGE_MAX_EDGE', '2048'))
+        self.quality = quality or int(os.getenv('SAFENEST_IMAGE_QUALITY', '85'))
+        self.max_bytes = (max_kb or int(os.getenv('SAFENEST_IMAGE_MAX_KB', '1024'))) * 1024
+        self.enabled = enabled and PIL_AVAILABLE and os.getenv('SAFENEST_IMAGE_PREPROCESS', '1') != '0'
+        if enabled and not PIL_AVAILABLE:
+            print("WARNING: Pillow not installed - images will be sent at full size. Run: pip install Pillow")
+    
+    @property
+    def signature(self):
+        """Settings fingerprint; results for the same upload differ when these change"""
+        return f"jpeg-{self.max_edge}px-q{self.quality}-{self.max_bytes // 1024}kb"
+    
+    def process(self, img_bytes):
+        """Return (bytes to send, size info); falls back to the original bytes if anything goes wrong"""
+        info = {"original_bytes": len(img_bytes), "encoded_bytes": len(img_bytes), "preprocessed": False}
+        if not self.enabled:
+            return img_bytes, info
+        
+        from PIL import Image, ImageOps
+        
+        try:
+            source = Image.open(io.BytesIO(img_bytes))
+            info["original_dimensions"] = source.size
+            source.draft("RGB", (self.max_edge, self.max_edge))  # JPEG: decode at reduced scale
+            img = ImageOps.exif_transpose(source)
+            
+            # Flatten transparency onto white - JPEG has no alpha channel
+            if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            
+            if max(img.size) > self.max_edge:
+                img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+            
+            encoded, encoded_dimensions = self._encode(img)
+        except Exception as e:
+            print(f"  ⚠️ Image preprocessing skipped: {e}")
+            return img_bytes, info
+        
+        # Small or already-compressed uploads can come out bigger; keep the original pixels then, but
+        # still without their metadata (GPS position, camera serial, PNG text chunks)
+        if len(encoded) >= len(img_bytes):
+            stripped = self._strip_metadata(img_bytes)
+            if stripped is not None:
+                info["encoded_bytes"] = len(stripped)
+                return stripped, info
+            # Otherwise the bigger re-encode is sent - it is the only metadata-free copy
+        
+        info.update({
+            "encoded_bytes": len(encoded),
+            "encoded_dimensions": encoded_dimensions,
+            "preprocessed": True
+        })
+        return encoded, info
+    
+    @staticmethod
+    def _strip_metadata(img_bytes):
+        """Lossless re-save of a PNG or JPEG upload without its metadata; None where that is not possible"""
+        from PIL import Image
+        
+        try:
+            img = Image.open(io.BytesIO(img_bytes))
+            if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+                return None  # Without EXIF the pixels would be shown unrotated
+            buffer = io.BytesIO()
+            if img.format == "PNG":
+                # Text and eXIf chunks are only written when passed explicitly
+                img.save(buffer, format="PNG")
+            elif img.format == "JPEG":
+                # Reuse the upload's quantization tables and subsampling, so the pixels barely change
+                img.save(buffer, format="JPEG", quality="keep", subsampling="keep", comment=b"")
+            else:
+                return None
+        except Exception as e:
+            print(f"  ⚠️ Metadata stripping skipped: {e}")
+            return None
+        return buffer.getvalue()
+
+    def _encode(self, img):
+        """Encode as JPEG, lowering quality and then resolution until it fits; returns (bytes, dimensions)"""
+        from PIL import Image
+        
+        quality = self.quality
+        while True:
+            buffer = io.BytesIO()
+            # No exif/icc arguments are passed and the source's comment is cleared, so metadata is dropped
+            img.save(buffer, format="JPEG", quality=quality, optimize=True, comment=b"")
+            if buffer.tell() <= self.max_bytes:
+                return buffer.getvalue(), img.size
+            if quality > self.MIN_QUALITY:
+                quality = max(self.MIN_QUALITY, quality - 10)
+            elif max(img.size) > self.MIN_EDGE:
+                img = img.resize((max(1, int(img.width * 0.75)), max(1, int(img.height * 0.75))), Image.LANCZOS)
+            else:
+                return buffer.getvalue(), img.size
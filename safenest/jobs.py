@@ -0,0 +1,392 @@
+# safenest/jobs.py - Persistent inspection job queue (SQLite) drained by worker processes
+import argparse
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from io import BytesIO
+from pathlib import Path
+
+_PROJECT_DIR = Path(__file__).resolve().parent.parent
+JOBS_DB_PATH = _PROJECT_DIR / ".cache" / "jobs.db"
+
+# Job states; queued -> running -> done | failed
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobLostError(Exception):
+    """Raised to a worker writing to a job that was handed to another worker or has already finished"""
+
+
+class JobQueue:
+    """Inspection jobs persisted in SQLite, so they outlive Streamlit reruns and the processes that submit them.
+    
+    Uploads are stored with the job. Workers claim jobs atomically, record progress and per-image
+    events as they go, and store the final report. A job whose worker stops sending heartbeats is
+    handed to another worker, up to MAX_ATTEMPTS times; writes for a claimed job only succeed for the
+    attempt that currently owns it, so a slow worker whose job was taken over stops with JobLostError.
+    """
+    
+    MAX_ATTEMPTS = 3
+    
+    def __init__(self, db_path=None, stale_after=None, requeue_every=None):
+        self.db_path = Path(db_path or os.getenv('SAFENEST_JOBS_DB') or JOBS_DB_PATH)
+        self.stale_after = stale_after or float(os.getenv('SAFENEST_JOB_STALE_S', '300'))
+        # A job only goes stale after stale_after seconds, so looking for one on every poll is wasted work
+        self.requeue_every = requeue_every or float(os.getenv('SAFENEST_JOB_REQUEUE_S',
+                                                              str(min(30.0, self.stale_after / 4))))
+        self._next_requeue = 0.0
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                notes TEXT,
+                metadata TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                report TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_images (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+        """)
+    
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = _Transactions(conn)
+            conn = self._local.conn
+        return conn
+    
+    def submit(self, images, notes="", metadata=None):
+        """Queue an inspection of images (uploaded files or (name, bytes) pairs); returns the job ID"""
+        job_id = uuid.uuid4().hex
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, notes, metadata, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, notes, json.dumps(metadata or {}), time.time())
+            )
+            for idx, img in enumerate(images):
+                if isinstance(img, tuple):
+                    name, data = img
+                else:
+                    name = getattr(img, "name", f"image_{idx}")
+                    img.seek(0)
+                    data = img.read()
+                conn.execute("INSERT INTO job_images (job_id, idx, name, data) VALUES (?, ?, ?, ?)",
+                             (job_id, idx, name, data))
+        return job_id
+    
+    def claim(self, worker):
+        """Atomically take the oldest queued job for worker; returns the job row or None
+        
+        Idle polls only read: the write lock is taken once a queued job is seen (or stale jobs are
+        due to be looked for, every requeue_every seconds).
+        """
+        if time.monotonic() >= self._next_requeue:
+            self._next_requeue = time.monotonic() + self.requeue_every
+            self.requeue_stale()
+        if self._conn().execute("SELECT 1 FROM jobs WHERE status = ? LIMIT 1", (QUEUED,)).fetchone() is None:
+            return None
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?", (RUNNING, worker, now, now, row["id"])
+            )
+            return dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+    
+    def requeue_stale(self):
+        """Return running jobs with a silent worker to the queue, or fail them after MAX_ATTEMPTS"""
+        cutoff = time.time() - self.stale_after
+        if self._conn().execute(
+            "SELECT 1 FROM jobs WHERE status = ? AND heartbeat_at < ? LIMIT 1", (RUNNING, cutoff)
+        ).fetchone() is None:
+            return
+        with self._conn() as conn:
+            stale = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (RUNNING, cutoff, self.MAX_ATTEMPTS)
+            )]
+            for job_id in stale:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = 'worker stopped responding', finished_at = ? WHERE id = ?",
+                    (FAILED, time.time(), job_id)
+                )
+                conn.execute("DELETE FROM job_images WHERE job_id = ?", (job_id,))
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, cutoff)
+            )
+            # Events of an abandoned attempt would be repeated by the next one
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE status = ? AND attempts > 0)",
+                (QUEUED,)
+            )
+    
+    def images(self, job_id):
+        """Stored uploads of a job as named in-memory files"""
+        files = []
+        for row in self._conn().execute(
+            "SELECT name, data FROM job_images WHERE job_id = ? ORDER BY idx", (job_id,)
+        ):
+            upload = BytesIO(row["data"])
+            upload.name = row["name"]
+            files.append(upload)
+        return files
+    
+    @staticmethod
+    def _update_owned(conn, job, assignments, params):
+        """UPDATE a job only if the claimed attempt still owns it; raises JobLostError otherwise"""
+        cursor = conn.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ? AND worker = ? AND attempts = ?",
+            (*params, job["id"], RUNNING, job["worker"], job["attempts"])
+        )
+        if cursor.rowcount == 0:
+            raise JobLostError(f"Job {job['id']} attempt {job['attempts']} no longer belongs to {job['worker']}")
+    
+    def heartbeat(self, job):
+        """Confirm a claimed job (a row returned by claim) is still owned by its worker and mark it alive"""
+        with self._conn() as conn:
+            self._update_owned(conn, job, "heartbeat_at = ?", (time.time(),))
+    
+    def record_progress(self, job, update):
+        """Store the latest progress update of a claimed job; doubles as its heartbeat"""
+        with self._conn() as conn:
+            self._update_owned(conn, job, "progress = ?, heartbeat_at = ?",
+                               (json.dumps(update, default=str), time.time()))
+    
+    def add_event(self, job, event):
+        """Append one streaming event (see AgentOrchestrator.iter_inspection) to a claimed job"""
+        with self._conn() as conn:
+            self._update_owned(conn, job, "heartbeat_at = ?", (time.time(),))
+            conn.execute(
+                "INSERT INTO job_events (job_id, seq, event) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?)",
+                (job["id"], job["id"], json.dumps(event, default=str))
+            )
+    
+    def complete(self, job, report):
+        with self._conn() as conn:
+            self._update_owned(conn, job, "status = ?, report = ?, finished_at = ?",
+                               (DONE, json.dumps(report, default=str), time.time()))
+            # Uploads are only needed until the report exists
+            conn.execute("DELETE FROM job_images WHERE job_id = ?", (job["id"],))
+    
+    def fail(self, job, error):
+        with self._conn() as conn:
+            self._update_owned(conn, job, "status = ?, error = ?, finished_at = ?",
+                               (FAILED, str(error), time.time()))
+            # A failed job is not retried, so its uploads are never read again
+            conn.execute("DELETE FROM job_images WHERE job_id = ?", (job["id"],))
+    
+    def status(self, job_id):
+        """Job state without the report: status, progress (latest update dict), error and timings"""
+        row = self._conn().execute(
+            "SELECT id, status, progress, error, created_at, started_at, finished_at, attempts, worker, metadata "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status = dict(row)
+        status["progress"] = json.loads(status["progress"]) if status["progress"] else None
+        status["metadata"] = json.loads(status["metadata"]) if status["metadata"] else {}
+        return status
+    
+    def events(self, job_id, after=0):
+        """Events recorded after sequence number after, as (seq, event) pairs"""
+        return [(row["seq"], json.loads(row["event"])) for row in self._conn().execute(
+            "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        )]
+    
+    def report(self, job_id):
+        """Final report of a finished job, or None"""
+        row = self._conn().execute("SELECT report FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["report"]) if row and row["report"] else None
+    
+    def counts(self):
+        """Number of jobs per status"""
+        return {row["status"]: row["n"] for row in self._conn().execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+        )}
+    
+    def wait(self, job_id, poll_interval=0.5, timeout=None):
+        """Block until a job is done or failed; returns its final status"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if status is None or status["status"] in (DONE, FAILED):
+                return status
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {status['status']} after {timeout}s")
+            time.sleep(poll_interval)
+
+
+class _Transactions:
+    """Autocommit connection whose `with` block is one BEGIN IMMEDIATE ... COMMIT transaction"""
+    
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def process_job(queue, orchestrator, job, store=None):
+    """Run one claimed job through the orchestrator, recording progress, events and the report.
+    
+    With a ReportStore the report is also saved there under the job ID before the job is marked done.
+    The job is dropped as soon as a write finds it was handed to another worker.
+    """
+    job_id = job["id"]
+    try:
+        images = queue.images(job_id)
+        for event in orchestrator.iter_inspection(images, job["notes"] or "",
+                                                  lambda update: queue.record_progress(job, update)):
+            if event["event"] == "report":
+                if store is not None:
+                    queue.heartbeat(job)
+                    store.save(event["report"], json.loads(job["metadata"] or "{}"), report_id=job_id)
+                queue.complete(job, event["report"])
+            else:
+                queue.add_event(job, event)
+    except JobLostError as e:
+        print(f"⚠️ {e} - dropping it")
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {e}")
+        try:
+            queue.fail(job, e)
+        except JobLostError as lost:
+            print(f"⚠️ {lost} - not marking it failed")
+
+
+def run_worker(db_path=None, stop_event=None, poll_interval=0.5, parent_pid=None):
+    """Worker loop: claim queued jobs and process them until stop_event is set or the parent exits"""
+    from .orchestrator import AgentOrchestrator
+    from .reports import ReportStore
+    
+    queue = JobQueue(db_path)
+    store = ReportStore()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    orchestrator = None
+    print(f"👷 Inspection worker {worker} polling {queue.db_path}")
+    while stop_event is None or not stop_event.is_set():
+        if parent_pid is not None and os.getppid() != parent_pid:
+            break  # The app or supervisor that started this worker is gone
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        if orchestrator is None:
+            orchestrator = AgentOrchestrator()
+        print(f"👷 {worker} running job {job['id']} (attempt {job['attempts']})")
+        process_job(queue, orchestrator, job, store)
+
+
+class WorkerPool:
+    """Worker processes draining a JobQueue; each has its own orchestrator, while provider rate limits
+    are shared across processes (see resilience.SharedTokenBucket)
+    
+    Workers are separate `python -m safenest.jobs --run-worker` interpreters rather than
+    multiprocessing children, which would re-import the Streamlit script as their __main__.
+    """
+    
+    def __init__(self, workers=None, db_path=None):
+        self.workers = workers if workers is not None else int(os.getenv('SAFENEST_JOB_WORKERS', '2'))
+        self.db_path = db_path
+        self._processes = []
+    
+    def start(self):
+        command = [sys.executable, "-m", "safenest.jobs", "--run-worker", "--parent-pid", str(os.getpid())]
+        if self.db_path:
+            command += ["--db", str(self.db_path)]
+        for _ in range(self.workers):
+            self._processes.append(subprocess.Popen(command, cwd=_PROJECT_DIR))
+        return self
+    
+    def alive(self):
+        return sum(1 for process in self._processes if process.poll() is None)
+    
+    def stop(self, timeout=30):
+        """Let workers finish their current job, then exit"""
+        for process in self._processes:
+            process.send_signal(signal.SIGTERM)
+        for process in self._processes:
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._processes = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SafeNest inspection workers against the job queue")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('SAFENEST_JOB_WORKERS', '2')),
+                        help="Worker processes to start")
+    parser.add_argument("--db", default=None, help="Job queue database (default SAFENEST_JOBS_DB or .cache/jobs.db)")
+    parser.add_argument("--run-worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--parent-pid", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.run_worker:
+        # SIGTERM finishes the current job first; Ctrl+C is handled by the supervisor
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        run_worker(args.db, stop_event, parent_pid=args.parent_pid)
+        return
+    
+    pool = WorkerPool(args.workers, args.db).start()
+    print(f"👷 {args.workers} inspection worker(s) started - Ctrl+C to stop")
+    try:
+        while pool.alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping workers after their current job...")
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# safenest/knowledge.py - IRC knowledge base and its storage backends (JSON, compiled file, SQLite)
+import json
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+from .text import _STOPWORDS, _TOKEN_PATTERN, _score_to_confidence, tokenize
+
+
+# Knowledge base files live at the project root, next to the app
+_DATA_DIR = Path(__file__).resolve().parent.parent
+KB_JSON_PATH = _DATA_DIR / "irc_knowledge_base.json"
+KB_COMPILED_PATH = _DATA_DIR / "irc_knowledge_base.kb"
+
+# Compiled layout: header (magic, index offset, index length), one compact JSON blob per
+# section, then a JSON index mapping each code id to its (offset, length)
+_KB_MAGIC = b"SNKB0001"
+_KB_HEADER = struct.Struct("<8sQQ")
+
+def compile_knowledge_base(json_path=KB_JSON_PATH, output_path=KB_COMPILED_PATH):
+    """Compile the JSON knowledge base into the offset-indexed file read by CompiledCodeStore"""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    offsets = {}
+    with open(tmp_path, 'wb') as out:
+        out.write(_KB_HEADER.pack(_KB_MAGIC, 0, 0))
+        for code_id, code_info in data.get('codes', {}).items():
+            blob = json.dumps(code_info, separators=(",", ":")).encode("utf-8")
+            offsets[code_id] = [out.tell(), len(blob)]
+            out.write(blob)
+        
+        index_blob = json.dumps({"codes": offsets, "categories": data.get("categories", [])}).encode("utf-8")
+        index_offset = out.tell()
+        out.write(index_blob)
+        out.seek(0)
+        out.write(_KB_HEADER.pack(_KB_MAGIC, index_offset, len(index_blob)))
+    
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class CompiledCodeStore(Mapping):
+    """Read-only code mapping over a memory-mapped compiled knowledge base.
+    
+    Only the offset index is parsed up front; a section is decoded the first time it is read.
+    Pages are shared by every process that maps the same file.
+    """
+    
+    def __init__(self, path=KB_COMPILED_PATH):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = _KB_HEADER.unpack_from(self._mmap, 0)
+        if magic != _KB_MAGIC:
+            raise ValueError(f"{self.path} is not a compiled SafeNest knowledge base")
+        index = json.loads(self._mmap[index_offset:index_offset + index_length])
+        self._offsets = index["codes"]
+        self.categories = index.get("categories", [])
+        self._sections = {}
+    
+    def __getitem__(self, code_id):
+        section = self._sections.get(code_id)
+        if section is None:
+            offset, length = self._offsets[code_id]
+            section = json.loads(self._mmap[offset:offset + length])
+            self._sections[code_id] = section
+        return section
+    
+    def __contains__(self, code_id):
+        return code_id in self._offsets
+    
+    def __iter__(self):
+        return iter(self._offsets)
+    
+    def __len__(self):
+        return len(self._offsets)
+
+
+KB_SQLITE_PATH = _DATA_DIR / "irc_knowledge_base.db"
+DEFAULT_JURISDICTION = "IRC"
+
+def import_knowledge_base_to_sqlite(json_path=KB_JSON_PATH, db_path=KB_SQLITE_PATH, jurisdiction=DEFAULT_JURISDICTION):
+    """Load a knowledge base JSON into the SQLite/FTS5 store, replacing that jurisdiction's rows"""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS codes (
+                    jurisdiction TEXT NOT NULL,
+                    code_id TEXT NOT NULL,
+                    category TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (jurisdiction, code_id)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS codes_fts USING fts5(
+                    title, description, requirements, violations,
+                    jurisdiction UNINDEXED, code_id UNINDEXED,
+                    tokenize = 'porter unicode61'
+                );
+            """)
+            conn.execute("DELETE FROM codes WHERE jurisdiction = ?", (jurisdiction,))
+            conn.execute("DELETE FROM codes_fts WHERE jurisdiction = ?", (jurisdiction,))
+            for code_id, code_info in data.get('codes', {}).items():
+                conn.execute(
+                    "INSERT INTO codes (jurisdiction, code_id, category, data) VALUES (?, ?, ?, ?)",
+                    (jurisdiction, code_id, code_info.get("category", ""), json.dumps(code_info))
+                )
+                conn.execute(
+                    "INSERT INTO codes_fts (title, description, requirements, violations, jurisdiction, code_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (code_info.get("title", ""), code_info.get("description", ""),
+                     " ".join(code_info.get("requirements", [])), " ".join(code_info.get("violations", [])),
+                     jurisdiction, code_id)
+                )
+        return len(data.get('codes', {}))
+    finally:
+        conn.close()
+
+
+class SQLiteCodeStore(Mapping):
+    """Code mapping for one jurisdiction of the SQLite store, with FTS5 full-text search.
+    
+    Connections are opened read-only, one per thread.
+    """
+    
+    # Relative weight of title, description, requirements and violations in FTS5 ranking
+    FTS_WEIGHTS = (3.0, 1.0, 1.0, 2.0)
+    
+    def __init__(self, db_path=KB_SQLITE_PATH, jurisdiction=DEFAULT_JURISDICTION):
+        self.db_path = Path(db_path)
+        self.jurisdiction = jurisdiction
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Knowledge base database not found: {self.db_path}")
+        self._local = threading.local()
+        self._sections = {}
+        self.categories = [row[0] for row in self._conn().execute(
+            "SELECT DISTINCT category FROM codes WHERE jurisdiction = ? ORDER BY category", (jurisdiction,))]
+    
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+    
+    def __getitem__(self, code_id):
+        section = self._sections.get(code_id)
+        if section is None:
+            row = self._conn().execute(
+                "SELECT data FROM codes WHERE jurisdiction = ? AND code_id = ?", (self.jurisdiction, code_id)
+            ).fetchone()
+            if row is None:
+                raise KeyError(code_id)
+            section = json.loads(row[0])
+            self._sections[code_id] = section
+        return section
+    
+    def __iter__(self):
+        rows = self._conn().execute(
+            "SELECT code_id FROM codes WHERE jurisdiction = ? ORDER BY rowid", (self.jurisdiction,)
+        ).fetchall()
+        return iter(row[0] for row in rows)
+    
+    def __len__(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM codes WHERE jurisdiction = ?", (self.jurisdiction,)
+        ).fetchone()[0]
+    
+    def search(self, text, limit=2):
+        """FTS5 BM25 search; returns [(code_id, score)] with higher scores more relevant"""
+        terms = [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+        if not terms:
+            return []
+        # Quoted terms OR-ed together so user text can never be parsed as FTS5 syntax
+        match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+        weights = ", ".join(str(w) for w in self.FTS_WEIGHTS)
+        rows = self._conn().execute(
+            f"SELECT code_id, bm25(codes_fts, {weights}) AS rank FROM codes_fts "
+            "WHERE codes_fts MATCH ? AND jurisdiction = ? ORDER BY rank, code_id LIMIT ?",
+            (match, self.jurisdiction, limit)
+        ).fetchall()
+        # FTS5 bm25() is negative, lower meaning more relevant
+        return [(code_id, -rank) for code_id, rank in rows]
+
+
+class IRCKnowledgeBase:
+    """RAG-based IRC Code Knowledge Base
+    
+    Storage is pluggable: backend "file" (default) reads the compiled file or the JSON source,
+    backend "sqlite" reads one jurisdiction of the SQLite/FTS5 store.
+    """
+    
+    # Relative weight of a token depending on which field of a code it appears in
+    FIELD_WEIGHTS = {"title": 3.0, "violations": 2.0, "requirements": 1.0, "description": 1.0}
+    
+    # Curated defect vocabulary -> codes, folded into the index as extra postings
+    KEYWORD_MAP = {
+        'crack': ['R302.1', 'R403.1', 'R602.10'],
+        'water': ['R302.1', 'R806.1', 'P2903.2', 'M1411.3'],
+        'electrical': ['E3404.1', 'E3605.1'],
+        'foundation': ['R403.1'],
+        'plumbing': ['P2903.2'],
+        'leak': ['R806.1', 'P2903.2', 'M1411.3'],
+        'structural': ['R403.1', 'R602.10'],
+        'paint': ['R703.1'],
+        'window': ['R308.4'],
+        'roof': ['R905.2', 'R806.1'],
+        'hvac': ['M1411.3'],
+        'wall': ['R302.1', 'R602.10', 'R703.1'],
+        'moisture': ['R806.1', 'R302.1'],
+        'damage': ['R302.1', 'R806.1', 'R403.1'],
+        'ceiling': ['R806.1']
+    }
+    KEYWORD_WEIGHT = 2.0
+    
+    def __init__(self, backend=None, jurisdiction=None):
+        self.backend = backend or os.getenv('SAFENEST_KB_BACKEND', 'file')
+        self.jurisdiction = jurisdiction or os.getenv('SAFENEST_JURISDICTION', DEFAULT_JURISDICTION)
+        self.codes = {}
+        self.load_knowledge_base()
+        
+        # The search index touches every section, so it is only built on the first search
+        self._index = None
+        self._index_lock = threading.Lock()
+    
+    def load_knowledge_base(self):
+        """Load IRC codes, preferring the compiled memory-mapped file when it is up to date"""
+        if self.backend == "sqlite":
+            try:
+                self.codes = SQLiteCodeStore(os.getenv('SAFENEST_KB_DB', KB_SQLITE_PATH), self.jurisdiction)
+                return
+            except Exception as e:
+                print(f"Warning: Could not open SQLite knowledge base, falling back to file: {e}")
+        
+        kb_path = KB_JSON_PATH
+        compiled_path = KB_COMPILED_PATH
+        if compiled_path.exists() and (not kb_path.exists() or compiled_path.stat().st_mtime >= kb_path.stat().st_mtime):
+            try:
+                self.codes = CompiledCodeStore(compiled_path)
+                return
+            except Exception as e:
+                print(f"Warning: Could not map compiled knowledge base, falling back to JSON: {e}")
+        
+        try:
+            with open(kb_path, 'r') as f:
+                data = json.load(f)
+                self.codes = data.get('codes', {})
+        except Exception as e:
+            print(f"Warning: Could not load IRC knowledge base: {e}")
+            self.codes = {}
+    
+    def _build_index(self):
+        """Inverted index: normalized token -> {code_id: idf-weighted field score}"""
+        index = {}
+        for code_id, code_info in self.codes.items():
+            for field, weight in self.FIELD_WEIGHTS.items():
+                value = code_info.get(field, "")
+                text = " ".join(value) if isinstance(value, list) else str(value)
+                for token in set(tokenize(text)):
+                    postings = index.setdefault(token, {})
+                    postings[code_id] = postings.get(code_id, 0.0) + weight
+        
+        for keyword, code_ids in self.KEYWORD_MAP.items():
+            for token in tokenize(keyword):
+                postings = index.setdefault(token, {})
+                for code_id in code_ids:
+                    if code_id in self.codes:
+                        postings[code_id] = postings.get(code_id, 0.0) + self.KEYWORD_WEIGHT
+        
+        # Tokens shared by many codes ("wall", "water") discriminate less than rare ones
+        total_codes = max(len(self.codes), 1)
+        for token in list(index):
+            postings = index[token]
+            if not postings:
+                del index[token]
+                continue
+            idf = math.log(1 + total_codes / len(postings))
+            for code_id in postings:
+                postings[code_id] *= idf
+        
+        self._index = index
+    
+    def retrieve_code(self, code_id):
+        """Retrieve specific IRC code information"""
+        return self.codes.get(code_id, None)
+    
+    def search_by_violation(self, defect_type, limit=2):
+        """RAG: Search IRC codes by defect type (semantic matching)"""
+        if hasattr(self.codes, "search"):
+            # Store with its own full-text index (SQLite FTS5)
+            ranked = self.codes.search(defect_type, limit)
+        else:
+            if self._index is None:
+                with self._index_lock:
+                    if self._index is None:
+                        self._build_index()
+            
+            scores = {}
+            for token in set(tokenize(defect_type)):
+                for code_id, weight in self._index.get(token, {}).items():
+                    scores[code_id] = scores.get(code_id, 0.0) + weight
+            
+            # Highest score first; code id breaks ties so results are deterministic
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        
+        return [{
+            'code': code_id,
+            'title': self.codes[code_id]['title'],
+            'description': self.codes[code_id]['description'],
+            'confidence': _score_to_confidence(score)
+        } for code_id, score in ranked]
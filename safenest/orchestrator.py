@@ -0,0 +1,297 @@
+# safenest/orchestrator.py - Multi-agent inspection pipeline
+import base64
+import hashlib
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .compliance import ComplianceAgent
+from .finance import FinanceAgent
+from .imaging import ImagePreprocessor, hamming_distance, perceptual_hash
+from .vision import VisionAgent
+
+
+class AgentOrchestrator:
+    """Enhanced orchestrator with RAG integration"""
+    
+    def __init__(self, max_workers=None, dedupe=True, dedupe_threshold=None):
+        self.vision_agent = VisionAgent()
+        self.compliance_agent = ComplianceAgent()
+        self.finance_agent = FinanceAgent()
+        self.preprocessor = ImagePreprocessor()
+        
+        # Images are analyzed in parallel; provider caps inside VisionAgent bound the API load
+        self.max_workers = max_workers or int(os.getenv('SAFENEST_IMAGE_WORKERS', '4'))
+        self._image_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inspection-image")
+        
+        # Uploads whose perceptual hashes differ by at most this many bits (of 64) are analyzed once
+        self.dedupe = dedupe and os.getenv('SAFENEST_DEDUPE', '1') != '0'
+        self.dedupe_threshold = (dedupe_threshold if dedupe_threshold is not None
+                                 else int(os.getenv('SAFENEST_DEDUPE_THRESHOLD', '8')))
+        # Hashes with fewer set (or unset) bits than this describe too little structure to be compared
+        self.dedupe_min_bits = int(os.getenv('SAFENEST_DEDUPE_MIN_BITS', '8'))
+    
+    def provider_stats(self):
+        """Throttles, retries and breaker state per vision provider since start-up"""
+        return self.vision_agent.provider_stats()
+    
+    def process_inspection(self, images, notes, progress_callback=None):
+        """Process inspection with full multi-agent workflow
+        
+        progress_callback, if given, receives a dict for each real pipeline step (see iter_inspection).
+        """
+        report = None
+        for event in self.iter_inspection(images, notes, progress_callback):
+            if event["event"] == "report":
+                report = event["report"]
+        return report
+    
+    def iter_inspection(self, images, notes, progress_callback=None):
+        """Streaming variant of process_inspection.
+        
+        Yields an "image" event as each image finishes (its defects, its compliance matches and
+        running totals), then a final "report" event with the same report process_inspection returns.
+        
+        Near-duplicate uploads (burst or re-framed shots of the same spot) are analyzed once: the
+        others get an event with "duplicate_of" and a copy of the representative's defects, and are
+        left out of the report's totals so one defect is not counted and costed several times.
+        
+        progress_callback, if given, is called on the caller's thread with a dict whose "stage" is one of
+        image_started, provider_responded, image_finished, compliance_done or finance_done, plus
+        images_done / images_total and an overall "progress" fraction between 0 and 1.
+        """
+        # Workers post progress here; it is relayed on this thread so UI callbacks stay safe
+        progress_queue = queue.Queue()
+        
+        # Step 1: Vision Agent - Analyze all images
+        # Uploads are read on the calling thread; decoding and provider calls happen on the workers
+        uploads = {}
+        names = []
+        for idx, img in enumerate(images):
+            names.append(getattr(img, "name", f"image_{idx}"))
+            try:
+                img.seek(0)  # Reset file pointer
+                uploads[idx] = img.read()
+            except Exception as e:
+                print(f"Error processing image {idx}: {e}")
+        
+        duplicate_of = self._find_duplicates(uploads, names)
+        duplicates = {}
+        for idx, (representative, _) in duplicate_of.items():
+            duplicates.setdefault(representative, []).append(idx)
+        
+        futures = {}
+        for idx, img_bytes in uploads.items():
+            if idx not in duplicate_of:
+                futures[self._image_pool.submit(
+                    self._analyze_upload, img_bytes, notes, names[idx], self._progress_reporter(progress_queue, idx, names[idx])
+                )] = idx
+        
+        results = {}
+        totals = {"images_done": 0, "images_total": len(uploads), "duplicates": 0, "defects": 0,
+                  "high": 0, "medium": 0, "low": 0, "estimated_cost": 0}
+        
+        # Vision work is 90% of the bar: one unit per provider answer plus one when the image is done
+        units_per_image = len(self.vision_agent.active_providers()) + 1
+        image_units = {idx: 0 for idx in uploads}
+        
+        def report_progress(update):
+            if update["stage"] == "provider_responded":
+                image_units[update["index"]] = min(image_units[update["index"]] + 1, units_per_image - 1)
+            elif update["stage"] == "image_finished":
+                image_units[update["index"]] = units_per_image
+            total_units = max(len(image_units), 1) * units_per_image
+            update.update({
+                "images_done": totals["images_done"],
+                "images_total": totals["images_total"],
+                "progress": 0.9 * sum(image_units.values()) / total_units
+            })
+            if progress_callback:
+                progress_callback(update)
+        
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            while not progress_queue.empty():
+                report_progress(progress_queue.get_nowait())
+            for future in done:
+                idx = futures[future]
+                yield self._image_event(future, idx, names[idx], results, totals, report_progress)
+                for dup_idx in duplicates.get(idx, []):
+                    yield self._duplicate_event(dup_idx, names[dup_idx], idx, names[idx], duplicate_of[dup_idx][1],
+                                                results, totals, report_progress)
+        
+        # Aggregate in upload order so the report is independent of completion order
+        all_defects = []
+        image_stats = {"images": 0, "original_bytes": 0, "encoded_bytes": 0, "duplicates": len(duplicate_of),
+                       "early_exits": 0}
+        for idx in sorted(results):
+            defects, size_info = results[idx]
+            all_defects.extend(defects)
+            image_stats["images"] += 1
+            # Images the "fast" provider policy settled with a single provider call
+            if idx not in duplicate_of and any(d.get("analysis_policy") == "fast-early-exit" for d in defects):
+                image_stats["early_exits"] += 1
+            image_stats["original_bytes"] += size_info["original_bytes"]
+            image_stats["encoded_bytes"] += size_info["encoded_bytes"]
+        
+        # Step 2: Compliance Agent - RAG-based IRC checking
+        compliance_data = self.compliance_agent.check_compliance(all_defects)
+        if progress_callback:
+            progress_callback({"stage": "compliance_done", "images_done": totals["images_done"],
+                               "images_total": totals["images_total"], "progress": 0.95})
+        
+        # Step 3: Finance Agent - Generate report
+        report = self.finance_agent.generate_report(all_defects, compliance_data)
+        report["image_stats"] = image_stats
+        report["duplicate_images"] = {names[idx]: names[representative]
+                                      for idx, (representative, _) in sorted(duplicate_of.items())}
+        if progress_callback:
+            progress_callback({"stage": "finance_done", "images_done": totals["images_done"],
+                               "images_total": totals["images_total"], "progress": 1.0})
+        
+        yield {"event": "report", "report": report}
+    
+    def _image_event(self, future, idx, image_name, results, totals, report_progress):
+        """Turn one finished image future into its streaming event, updating the running totals"""
+        event = {"event": "image", "index": idx, "image_name": image_name}
+        try:
+            defects, size_info = future.result()
+            results[idx] = (defects, size_info)
+            event["defects"] = defects
+            event["compliance"] = self.compliance_agent.check_compliance(defects)
+            event["image_stats"] = size_info
+        except Exception as e:
+            print(f"Error processing image {idx}: {e}")
+            event["defects"] = []
+            event["error"] = str(e)
+        
+        totals["images_done"] += 1
+        totals["defects"] += len(event["defects"])
+        for defect in event["defects"]:
+            severity = defect.get("severity", "").lower()
+            if severity in ("high", "medium", "low"):
+                totals[severity] += 1
+            totals["estimated_cost"] += defect.get("estimated_cost", 0)
+        event["totals"] = dict(totals)
+        
+        report_progress({"stage": "image_finished", "index": idx, "image_name": image_name,
+                         "defects": len(event["defects"])})
+        return event
+    
+    def _duplicate_event(self, idx, image_name, representative, representative_name, distance,
+                         results, totals, report_progress):
+        """Event for a near-duplicate upload, reusing its representative's analysis"""
+        event = {"event": "image", "index": idx, "image_name": image_name, "duplicate_of": representative_name}
+        if representative in results:
+            event["defects"] = [dict(defect, image_ref=image_name, duplicate_of=representative_name)
+                                for defect in results[representative][0]]
+            event["compliance"] = self.compliance_agent.check_compliance(event["defects"])
+            event["image_stats"] = {"duplicate_of": representative_name, "hamming_distance": distance}
+        else:
+            event["defects"] = []
+            event["error"] = f"near-duplicate of {representative_name}, which could not be analyzed"
+        
+        # The representative already counted these defects
+        totals["images_done"] += 1
+        totals["duplicates"] += 1
+        event["totals"] = dict(totals)
+        
+        report_progress({"stage": "image_finished", "index": idx, "image_name": image_name,
+                         "defects": len(event["defects"])})
+        return event
+    
+    def _find_duplicates(self, uploads, names):
+        """Map each near-duplicate upload index to (representative index, Hamming distance)
+        
+        Uploads are visited in order; each one joins the closest earlier representative within
+        dedupe_threshold bits, or becomes a representative itself. Byte-identical uploads always match.
+        Only uploads with the same file extension are grouped, as image validation depends on it.
+        
+        Featureless images (near-uniform thumbnails, or hashes with almost every bit equal) are never
+        grouped by hash: dHash reduces them all to roughly the same value, so an all-black and an
+        all-white photo would otherwise match. They are only merged when their bytes are identical.
+        Uploads the vision agent rejects by file name are neither hashed nor grouped.
+        """
+        indices = [idx for idx in uploads if self.vision_agent.accepts_file_name(names[idx])]
+        if not self.dedupe or len(indices) < 2:
+            return {}
+        
+        hashes = dict(zip(indices, self._image_pool.map(perceptual_hash, [uploads[idx] for idx in indices])))
+        for idx, image_hash in hashes.items():
+            if image_hash is not None and not self.dedupe_min_bits <= bin(image_hash).count("1") <= 64 - self.dedupe_min_bits:
+                hashes[idx] = None
+        representatives = []
+        by_digest = {}
+        duplicate_of = {}
+        for idx in indices:
+            extension = os.path.splitext(names[idx])[1].lower()
+            digest = (extension, hashlib.sha256(uploads[idx]).digest())
+            if digest in by_digest:
+                duplicate_of[idx] = (by_digest[digest], 0)
+                continue
+            
+            closest = None
+            if hashes[idx] is not None:
+                closest = min(((hamming_distance(hashes[idx], hashes[rep]), rep) for rep in representatives
+                               if hashes[rep] is not None and os.path.splitext(names[rep])[1].lower() == extension),
+                              default=None)
+            if closest is not None and closest[0] <= self.dedupe_threshold:
+                duplicate_of[idx] = (closest[1], closest[0])
+                by_digest[digest] = closest[1]
+                print(f"  🪞 {names[idx]} is a near-duplicate of {names[closest[1]]} ({closest[0]} bits) - reusing its analysis")
+            else:
+                representatives.append(idx)
+                by_digest[digest] = idx
+        return duplicate_of
+    
+    @staticmethod
+    def _progress_reporter(progress_queue, idx, image_name):
+        """Callback handed to a worker thread; it only enqueues, the caller's thread relays"""
+        def report(stage, **info):
+            progress_queue.put({"stage": stage, "index": idx, "image_name": image_name, **info})
+        return report
+
+    async def aiter_inspection(self, images, notes):
+        """Async-iterator form of iter_inspection; the blocking steps run in the default executor"""
+        import asyncio
+        
+        loop = asyncio.get_running_loop()
+        events = self.iter_inspection(images, notes)
+        done = object()
+        while True:
+            event = await loop.run_in_executor(None, next, events, done)
+            if event is done:
+                break
+            yield event
+    
+    def _analyze_upload(self, img_bytes, notes, image_name, on_progress=None):
+        """Shrink one upload, then run the vision agent on it; returns (defects, size info)
+        
+        size info also carries the image's wall-clock "elapsed" seconds on the worker.
+        """
+        started = time.perf_counter()
+        if on_progress:
+            on_progress("image_started")
+        
+        if not self.vision_agent.accepts_file_name(image_name):
+            # Rejected by file name alone: no point decoding, shrinking or hashing the upload
+            size_info = {"original_bytes": len(img_bytes), "encoded_bytes": len(img_bytes), "preprocessed": False}
+            defects = self.vision_agent.analyze_image("", notes, image_name, "", on_progress)
+            size_info["elapsed"] = round(time.perf_counter() - started, 3)
+            return defects, size_info
+        
+        img_hash = hashlib.sha256(img_bytes).hexdigest()
+        encoded_bytes, size_info = self.preprocessor.process(img_bytes)
+        if size_info["preprocessed"]:
+            # Provider output depends on the encoding settings, so they are part of the cache address
+            img_hash = f"{img_hash}:{self.preprocessor.signature}"
+            saved = 100 * (1 - size_info["encoded_bytes"] / size_info["original_bytes"])
+            print(f"  🗜️ {image_name}: {size_info['original_bytes'] // 1024} KB → "
+                  f"{size_info['encoded_bytes'] // 1024} KB ({saved:.0f}% smaller)")
+        
+        img_base64 = base64.b64encode(encoded_bytes).decode()
+        defects = self.vision_agent.analyze_image(img_base64, notes, image_name, img_hash, on_progress)
+        size_info["elapsed"] = round(time.perf_counter() - started, 3)
+        return defects, size_info
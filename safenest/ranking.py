@@ -0,0 +1,105 @@
+# safenest/ranking.py - Vectorized BM25 ranking of IRC codes (imported on first use; requires NumPy)
+import numpy as np
+
+from .text import tokenize
+
+
+class BM25Ranker:
+    """Okapi BM25 over the knowledge-base text, held as term-major sparse NumPy arrays.
+    
+    Every query of a batch is scored against every code in one vectorized pass.
+    """
+    
+    def __init__(self, knowledge_base, k1=1.5, b=0.75):
+        self.knowledge_base = knowledge_base
+        self.code_ids = list(knowledge_base.codes.keys())
+        self.vocab = {}
+        
+        # Document-term triples (doc, term, term frequency)
+        doc_rows, term_cols, term_freqs, doc_lengths = [], [], [], []
+        for doc_idx, code_id in enumerate(self.code_ids):
+            counts = {}
+            for token in tokenize(self._document_text(knowledge_base.codes[code_id])):
+                counts[token] = counts.get(token, 0) + 1
+            doc_lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                doc_rows.append(doc_idx)
+                term_cols.append(self.vocab.setdefault(token, len(self.vocab)))
+                term_freqs.append(tf)
+        
+        doc_rows = np.asarray(doc_rows, dtype=np.int64)
+        term_cols = np.asarray(term_cols, dtype=np.int64)
+        term_freqs = np.asarray(term_freqs, dtype=np.float64)
+        doc_lengths = np.asarray(doc_lengths, dtype=np.float64)
+        
+        num_docs = len(self.code_ids)
+        avg_length = doc_lengths.mean() if num_docs else 1.0
+        doc_freqs = np.bincount(term_cols, minlength=len(self.vocab))
+        idf = np.log(1 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        
+        # Precomputed BM25 contribution of each (term, doc) pair
+        norm = k1 * (1 - b + b * doc_lengths[doc_rows] / max(avg_length, 1e-9))
+        weights = idf[term_cols] * term_freqs * (k1 + 1) / (term_freqs + norm)
+        
+        # Sort postings by term (CSC layout): postings of term t live in [indptr[t], indptr[t + 1])
+        order = np.argsort(term_cols, kind="stable")
+        self.posting_docs = doc_rows[order]
+        self.posting_weights = weights[order]
+        self.indptr = np.concatenate(([0], np.cumsum(doc_freqs)))
+    
+    @staticmethod
+    def _document_text(code_info):
+        """Searchable text of one code: title, description, requirements and violations"""
+        parts = [code_info.get("title", ""), code_info.get("description", "")]
+        parts.extend(code_info.get("requirements", []))
+        parts.extend(code_info.get("violations", []))
+        return " ".join(parts)
+    
+    def score(self, queries):
+        """Dense (len(queries), len(codes)) matrix of BM25 scores"""
+        num_docs = len(self.code_ids)
+        query_rows, query_terms = [], []
+        for query_idx, query in enumerate(queries):
+            for token in set(tokenize(query)):
+                term = self.vocab.get(token)
+                if term is not None:
+                    query_rows.append(query_idx)
+                    query_terms.append(term)
+        
+        if not query_terms or not num_docs:
+            return np.zeros((len(queries), num_docs))
+        
+        query_rows = np.asarray(query_rows, dtype=np.int64)
+        query_terms = np.asarray(query_terms, dtype=np.int64)
+        starts = self.indptr[query_terms]
+        lengths = self.indptr[query_terms + 1] - starts
+        
+        # Flat positions of every posting touched by every (query, term) pair
+        run_offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - run_offsets, lengths) + np.arange(lengths.sum())
+        rows = np.repeat(query_rows, lengths)
+        
+        flat = rows * num_docs + self.posting_docs[positions]
+        scores = np.bincount(flat, weights=self.posting_weights[positions], minlength=len(queries) * num_docs)
+        return scores.reshape(len(queries), num_docs)
+    
+    def rank(self, queries, k=3):
+        """Top-k codes per query as dicts with code, title, description and BM25 score"""
+        scores = self.score(queries)
+        results = []
+        for query_scores in scores:
+            candidates = np.flatnonzero(query_scores > 0)
+            # Highest score first, knowledge-base order breaks ties
+            top = candidates[np.lexsort((candidates, -query_scores[candidates]))][:k]
+            matches = []
+            for doc_idx in top:
+                code_id = self.code_ids[doc_idx]
+                code_info = self.knowledge_base.codes[code_id]
+                matches.append({
+                    "code": code_id,
+                    "title": code_info.get("title", ""),
+                    "description": code_info.get("description", ""),
+                    "score": float(query_scores[doc_idx])
+                })
+            results.append(matches)
+        return results
@@ -0,0 +1,94 @@
+# safenest/reports.py - Persistent store of finished inspection reports (SQLite)
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+REPORTS_DB_PATH = Path(__file__).resolve().parent.parent / "inspection_reports.db"
+
+
+class ReportStore:
+    """Finished inspection reports keyed by report ID, indexed by property, inspection date and risk score.
+    
+    Reports are stored as JSON next to the columns they are searched by, so reopening a shared or
+    reloaded report is one primary-key lookup instead of a new analysis.
+    """
+    
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or os.getenv('SAFENEST_REPORTS_DB') or REPORTS_DB_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS reports (
+                id TEXT PRIMARY KEY,
+                property_id TEXT,
+                inspection_date TEXT,
+                risk_score REAL,
+                total_defects INTEGER,
+                total_cost INTEGER,
+                created_at REAL NOT NULL,
+                metadata TEXT,
+                report TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS reports_property_date ON reports (property_id, inspection_date);
+            CREATE INDEX IF NOT EXISTS reports_date ON reports (inspection_date);
+            CREATE INDEX IF NOT EXISTS reports_risk ON reports (risk_score);
+        """)
+    
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+    
+    def save(self, report, metadata=None, report_id=None):
+        """Store an orchestrator report; metadata carries property_id and inspection_date (ISO). Returns the report ID"""
+        metadata = metadata or {}
+        report_id = report_id or uuid.uuid4().hex
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (id, property_id, inspection_date, risk_score, total_defects, "
+                "total_cost, created_at, metadata, report) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (report_id, metadata.get("property_id"), metadata.get("inspection_date"),
+                 report.get("risk_score"), report.get("total_defects"), report.get("total_cost"),
+                 time.time(), json.dumps(metadata, default=str), json.dumps(report, default=str))
+            )
+        return report_id
+    
+    def get(self, report_id):
+        """Stored report with its metadata, or None"""
+        row = self._conn().execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        if row is None:
+            return None
+        stored = dict(row)
+        stored["metadata"] = json.loads(stored["metadata"]) if stored["metadata"] else {}
+        stored["report"] = json.loads(stored["report"])
+        return stored
+    
+    def search(self, property_id=None, date_from=None, date_to=None, min_risk=None, limit=50):
+        """Report summaries (without the report body), newest inspection first"""
+        clauses, params = [], []
+        if property_id is not None:
+            clauses.append("property_id = ?")
+            params.append(property_id)
+        if date_from is not None:
+            clauses.append("inspection_date >= ?")
+            params.append(str(date_from))
+        if date_to is not None:
+            clauses.append("inspection_date <= ?")
+            params.append(str(date_to))
+        if min_risk is not None:
+            clauses.append("risk_score >= ?")
+            params.append(min_risk)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [dict(row) for row in self._conn().execute(
+            "SELECT id, property_id, inspection_date, risk_score, total_defects, total_cost, created_at "
+            f"FROM reports {where} ORDER BY inspection_date DESC, created_at DESC LIMIT ?", params + [limit]
+        )]
@@ -0,0 +1,392 @@
+# safenest/resilience.py - Rate limiting, retries and circuit breaking for provider calls
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server-side failures
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Requests per minute when SAFENEST_<PROVIDER>_RPM is not set
+DEFAULT_RPM = {"OpenAI": 500, "Grok": 60}
+
+# Token buckets shared by every process of the app (Streamlit, job workers, batch runs)
+RATE_LIMIT_DB_PATH = Path(__file__).resolve().parent.parent / ".cache" / "rate_limits.db"
+
+
+class ProviderHTTPError(Exception):
+    """Non-200 provider response, carrying the server's Retry-After (seconds) when it sent one"""
+    
+    def __init__(self, provider, status_code, body="", retry_after=None):
+        super().__init__(f"{provider} API Error: {status_code} - {body[:200]}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+def parse_retry_after(headers):
+    """Seconds to wait from retry-after-ms / Retry-After (seconds or HTTP date) headers, or None"""
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity`"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self):
+        """Take one token, going into debt if none is left; returns how long the caller must wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def refund(self):
+        """Give back a token reserved for a request that will not be sent"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class SharedTokenBucket:
+    """TokenBucket kept in SQLite, so every process on the machine draws from the same quota.
+    
+    The bucket state is read and written in one BEGIN IMMEDIATE transaction per reservation; with
+    provider calls taking seconds, that write is negligible.
+    """
+    
+    def __init__(self, name, rate, capacity, db_path=None):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.db_path = Path(db_path or os.getenv('SAFENEST_RATE_LIMIT_DB') or RATE_LIMIT_DB_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+    
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    
+    def _take(self, amount):
+        """Refill the shared bucket, then remove amount tokens (negative to give some back); returns the balance"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            # Wall-clock time: monotonic clocks are not comparable across processes
+            now = time.time()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            tokens = min(self.capacity, tokens - amount)
+            conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                         (self.name, tokens, now))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return tokens
+    
+    def reserve(self):
+        """Take one token, going into debt if none is left; returns how long the caller must wait"""
+        tokens = self._take(1)
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+    
+    def refund(self):
+        """Give back a token reserved for a request that will not be sent"""
+        self._take(-1)
+
+
+def make_token_bucket(name, rate, capacity):
+    """SharedTokenBucket for a provider, or a per-process TokenBucket if SAFENEST_SHARED_RATE_LIMIT=0 or
+    the shared database cannot be opened"""
+    if os.getenv('SAFENEST_SHARED_RATE_LIMIT', '1') != '0':
+        try:
+            return SharedTokenBucket(name, rate, capacity)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: Shared rate limit disabled for {name} ({e}) - limiting this process only")
+    return TokenBucket(rate, capacity)
+
+
+class LatencyTracker:
+    """Rolling latency and error rate of recent calls: the last `window` calls, none older than `max_age` seconds"""
+    
+    def __init__(self, window=100, max_age=300.0):
+        self.max_age = max_age
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds, ok))
+    
+    def _recent(self):
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+    
+    def snapshot(self):
+        """samples, error_rate and nearest-rank p50/p95 of successful calls (None without any)"""
+        samples = self._recent()
+        latencies = sorted(seconds for _, seconds, ok in samples if ok)
+        
+        def percentile(pct):
+            if not latencies:
+                return None
+            return latencies[max(1, -(-len(latencies) * pct // 100)) - 1]
+        
+        return {
+            "samples": len(samples),
+            "error_rate": sum(1 for _, _, ok in samples if not ok) / len(samples) if samples else 0.0,
+            "p50_s": percentile(50),
+            "p95_s": percentile(95)
+        }
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_after` seconds one trial call
+    is let through (half-open) and its outcome closes or re-opens the circuit"""
+    
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.opens = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class ProviderGuard:
+    """Rate limit, retry and circuit breaker wrapped around every call to one provider.
+    
+    Calls wait for a token from the provider's bucket, transient failures are retried with full-jitter
+    exponential backoff (or the server's Retry-After when it sends one), and once the breaker opens
+    calls fail fast with CircuitOpenError until the provider has had time to recover. The bucket is
+    shared with the app's other processes (see SharedTokenBucket); breaker and latency are per process.
+    """
+    
+    def __init__(self, name, requests_per_minute=None, burst=None, max_retries=None, base_delay=None,
+                 max_delay=None, failure_threshold=None, reset_after=None):
+        env = name.upper()
+        self.name = name
+        rpm = requests_per_minute or float(os.getenv(f'SAFENEST_{env}_RPM', str(DEFAULT_RPM.get(name, 60))))
+        self.bucket = make_token_bucket(name, rpm / 60.0, burst or int(os.getenv(f'SAFENEST_{env}_BURST', '4')))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('SAFENEST_PROVIDER_RETRIES', '3'))
+        self.base_delay = base_delay or float(os.getenv('SAFENEST_RETRY_BASE_S', '0.5'))
+        self.max_delay = max_delay or float(os.getenv('SAFENEST_RETRY_MAX_S', '20'))
+        self.breaker = CircuitBreaker(
+            failure_threshold or int(os.getenv('SAFENEST_BREAKER_FAILURES', '5')),
+            reset_after or float(os.getenv('SAFENEST_BREAKER_RESET_S', '30'))
+        )
+        self.latency = LatencyTracker(int(os.getenv('SAFENEST_LATENCY_WINDOW', '100')),
+                                      float(os.getenv('SAFENEST_LATENCY_MAX_AGE_S', '300')))
+        self._metrics = {"calls": 0, "successes": 0, "failures": 0, "throttled": 0, "throttle_wait_s": 0.0,
+                         "retries": 0, "short_circuited": 0, "deadline_giveups": 0}
+        self._lock = threading.Lock()
+    
+    def _count(self, metric, amount=1):
+        with self._lock:
+            self._metrics[metric] += amount
+    
+    def _misses_deadline(self, delay, deadline):
+        """True if a request sent in delay seconds would, at the provider's p50 latency, end after deadline"""
+        if deadline is None:
+            return False
+        expected = self.latency.snapshot()["p50_s"] or 0.0
+        return time.monotonic() + delay + expected > deadline
+    
+    def _before_attempt(self, deadline=None):
+        """Rate-limit reservation and breaker check; returns the seconds to wait before sending"""
+        wait = self.bucket.reserve()
+        if self._misses_deadline(wait, deadline):
+            # Waiting out the bucket would send the request after the caller stopped waiting for it
+            self.bucket.refund()
+            self._count("deadline_giveups")
+            raise TimeoutError(f"{self.name} rate limit would delay the call past its deadline ({wait:.1f}s wait)")
+        if not self.breaker.allow():
+            self.bucket.refund()
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name} circuit breaker is open - skipping call")
+        self._count("calls")
+        if wait > 0:
+            self._count("throttled")
+            self._count("throttle_wait_s", wait)
+        return wait
+    
+    def _after_failure(self, exc, attempt, retry_on, deadline=None):
+        """Record a failed attempt; returns the backoff delay, or None when the error should be raised"""
+        status = getattr(exc, "status_code", None)
+        if not isinstance(exc, retry_on) or (status is not None and status not in RETRYABLE_STATUS):
+            # The provider answered (e.g. a 400); that says nothing about its health
+            self.breaker.record_success()
+            return None
+        self._count("failures")
+        self.breaker.record_failure()
+        if attempt >= self.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+            return None
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is None:
+            retry_after = parse_retry_after(getattr(getattr(exc, "response", None), "headers", None))
+        delay = min(retry_after if retry_after is not None else random.uniform(0, self.base_delay * 2 ** attempt),
+                    self.max_delay)
+        if self._misses_deadline(delay, deadline):
+            # A retry that cannot answer before the caller stops waiting only burns a slot and a token
+            self._count("deadline_giveups")
+            print(f"  ⏱️ {self.name} attempt {attempt + 1} failed ({exc}) - no time left to retry")
+            return None
+        self._count("retries")
+        print(f"  🔁 {self.name} attempt {attempt + 1} failed ({exc}) - retrying in {delay:.1f}s")
+        return delay
+    
+    def _after_success(self, sent):
+        self.breaker.record_success()
+        self._count("successes")
+        self.latency.record(time.monotonic() - sent)
+    
+    def call(self, fn, *args, retry_on=(Exception,), deadline=None, **kwargs):
+        """fn(*args, **kwargs) under the rate limit, retrying exceptions in retry_on.
+        
+        Exceptions with a status_code are only retried for RETRYABLE_STATUS. deadline (a time.monotonic()
+        value) is when the caller stops waiting: no attempt is started whose rate-limit wait or backoff
+        plus the provider's p50 latency would end after it (TimeoutError if that is the first attempt).
+        Each attempt is one latency sample, timed from when it is sent, so local throttling and retry
+        backoff never count against the provider.
+        """
+        attempt = 0
+        while True:
+            wait = self._before_attempt(deadline)
+            if wait:
+                time.sleep(wait)
+            sent = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self.latency.record(time.monotonic() - sent, ok=False)
+                delay = self._after_failure(e, attempt, retry_on, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._after_success(sent)
+            return result
+    
+    async def acall(self, fn, *args, retry_on=(Exception,), deadline=None, **kwargs):
+        """Async variant of call for coroutine functions"""
+        import asyncio
+        
+        attempt = 0
+        while True:
+            wait = self._before_attempt(deadline)
+            if wait:
+                await asyncio.sleep(wait)
+            sent = time.monotonic()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                self.latency.record(time.monotonic() - sent, ok=False)
+                delay = self._after_failure(e, attempt, retry_on, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._after_success(sent)
+            return result
+    
+    def stats(self):
+        """Counters since start-up, the breaker's current state and rolling latency / error rate"""
+        with self._lock:
+            stats = dict(self._metrics)
+        stats["throttle_wait_s"] = round(stats["throttle_wait_s"], 3)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_opens"] = self.breaker.opens
+        stats.update(self.latency.snapshot())
+        return stats
+
+
+# One guard per provider, so every agent in the process shares the same quota and breaker
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_provider_guard(name):
+    """Process-wide ProviderGuard for a provider name (e.g. "OpenAI", "Grok")"""
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None:
+            guard = ProviderGuard(name)
+            _guards[name] = guard
+        return guard
+
+
+def provider_stats():
+    """Metrics of every provider guard created in this process"""
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {guard.name: guard.stats() for guard in guards}
@@ -0,0 +1,29 @@
+# safenest/text.py - Text normalization shared by the knowledge base and code ranking
+import re
+
+# Text normalization shared by the knowledge-base index and code retrieval
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "of", "on",
+    "or", "shall", "that", "the", "this", "to", "with", "within", "all", "not"
+})
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ness", "ment", "ies", "ied", "ed", "es", "s", "al", "ly")
+
+def _stem(token):
+    """Light suffix-stripping stem so crack/cracks/cracked and leak/leaking share an index entry"""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-3] + "y" if suffix in ("ies", "ied") else token[:-len(suffix)]
+            break
+    if token.endswith("e") and len(token) > 4:
+        token = token[:-1]
+    return token
+
+def tokenize(text):
+    """Lower-cased, stemmed word tokens with stop words removed"""
+    return [_stem(token) for token in _TOKEN_PATTERN.findall(text.lower())
+            if token not in _STOPWORDS and len(token) > 1]
+
+def _score_to_confidence(score):
+    """Map an unbounded relevance score onto the 0.85-1.0 confidence band used for RAG matches"""
+    return round(0.85 + 0.15 * score / (score + 4.0), 3)
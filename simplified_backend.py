@@ -1,853 +1,14 @@
-# simplified_backend.py - Enhanced with RAG and Grok API Integration
-import streamlit as st
-import json
-import base64
-import hashlib
-from datetime import datetime
-from pathlib import Path
-import random
-import requests
-import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Global flag for OpenAI availability
-OPENAI_AVAILABLE = False
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    pass
-
-class IRCKnowledgeBase:
-    """RAG-based IRC Code Knowledge Base"""
-    
-    def __init__(self):
-        self.codes = {}
-        self.load_knowledge_base()
-    
-    def load_knowledge_base(self):
-        """Load IRC codes from JSON knowledge base"""
-        kb_path = Path(__file__).parent / "irc_knowledge_base.json"
-        try:
-            with open(kb_path, 'r') as f:
-                data = json.load(f)
-                self.codes = data.get('codes', {})
-        except Exception as e:
-            print(f"Warning: Could not load IRC knowledge base: {e}")
-            self.codes = {}
-    
-    def retrieve_code(self, code_id):
-        """Retrieve specific IRC code information"""
-        return self.codes.get(code_id, None)
-    
-    def search_by_violation(self, defect_type):
-        """RAG: Search IRC codes by defect type (semantic matching)"""
-        defect_lower = defect_type.lower()
-        matched_codes = []
-        
-        # Keyword mapping for semantic matching
-        keyword_map = {
-            'crack': ['R302.1', 'R403.1', 'R602.10'],
-            'water': ['R302.1', 'R806.1', 'P2903.2', 'M1411.3'],
-            'electrical': ['E3404.1', 'E3605.1'],
-            'foundation': ['R403.1'],
-            'plumbing': ['P2903.2'],
-            'leak': ['R806.1', 'P2903.2', 'M1411.3'],
-            'structural': ['R403.1', 'R602.10'],
-            'paint': ['R703.1'],
-            'window': ['R308.4'],
-            'roof': ['R905.2', 'R806.1'],
-            'hvac': ['M1411.3'],
-            'wall': ['R302.1', 'R602.10', 'R703.1'],
-            'moisture': ['R806.1', 'R302.1'],
-            'damage': ['R302.1', 'R806.1', 'R403.1'],
-            'ceiling': ['R806.1']
-        }
-        
-        # Find matching codes based on keywords
-        for keyword, codes in keyword_map.items():
-            if keyword in defect_lower:
-                for code in codes:
-                    if code in self.codes and code not in [c['code'] for c in matched_codes]:
-                        code_info = self.codes[code]
-                        matched_codes.append({
-                            'code': code,
-                            'title': code_info['title'],
-                            'description': code_info['description'],
-                            'confidence': 0.85 + random.uniform(0, 0.15)  # High confidence for matches
-                        })
-        
-        return matched_codes[:2]  # Return top 2 matches
-
-
-class VisionAgent:
-    """Dual-AI Vision Agent - Uses both OpenAI GPT-4 Vision and Grok for maximum accuracy"""
-    
-    def __init__(self, grok_api_key=None, openai_api_key=None):
-        # Get API keys from environment variables or parameters
-        self.grok_api_key = grok_api_key or os.getenv('GROK_API_KEY')
-        self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
-        
-        if not self.grok_api_key:
-            print("WARNING: No Grok API key found. Set GROK_API_KEY environment variable.")
-        if not self.openai_api_key:
-            print("WARNING: No OpenAI API key found. Set OPENAI_API_KEY environment variable.")
-            
-        self.grok_url = "https://api.x.ai/v1/chat/completions"
-        self.openai_url = "https://api.openai.com/v1/chat/completions"
-        
-        # Initialize OpenAI client if available
-        if self.openai_api_key and OPENAI_AVAILABLE:
-            self.openai_client = OpenAI(api_key=self.openai_api_key)
-        elif self.openai_api_key and not OPENAI_AVAILABLE:
-            print("WARNING: OpenAI library not installed. Run: pip install openai")
-            self.openai_client = None
-        else:
-            self.openai_client = None
-        
-    def analyze_image(self, image_base64, notes="", image_name=""):
-        """Analyze image using BOTH OpenAI GPT-4 Vision and Grok for maximum accuracy"""
-        
-        print(f"\n🔍 Starting Dual-AI Analysis for {image_name}...")
-        
-        # STEP 1: Pre-screen image to check if it's suitable for property inspection
-        print("  → Pre-screening image validity...")
-        is_valid, validation_message = self._validate_property_image(image_base64, image_name)
-        
-        if not is_valid:
-            print(f"  ⚠️ {validation_message}")
-            return [{
-                "type": "Image Not Accepted",
-                "severity": "Low",
-                "location": "N/A",
-                "confidence": 0.0,
-                "description": validation_message,
-                "irc_code": "N/A",
-                "estimated_cost": 0,
-                "image_ref": image_name
-            }]
-        
-        print(f"  ✓ Image validated: {validation_message}")
-        
-        # STEP 2: Try OpenAI GPT-4 Vision first (generally more accurate)
-        openai_defects = []
-        if self.openai_client:
-            print("  → Analyzing with OpenAI GPT-4 Vision...")
-            openai_defects = self._analyze_with_openai(image_base64, notes, image_name)
-            print(f"  ✓ OpenAI found {len(openai_defects)} defects")
-        
-        # STEP 3: Then try Grok Vision
-        grok_defects = []
-        if self.grok_api_key:
-            print("  → Analyzing with Grok Vision...")
-            grok_defects = self._analyze_with_grok(image_base64, notes, image_name)
-            print(f"  ✓ Grok found {len(grok_defects)} defects")
-        
-        # STEP 4: Combine and validate results from both AIs
-        combined_defects = self._combine_ai_results(openai_defects, grok_defects, image_name)
-        print(f"  ✅ Final result: {len(combined_defects)} high-confidence defects\n")
-        
-        return combined_defects if combined_defects else self._get_fallback_defects(image_base64, image_name)
-    
-    def _validate_property_image(self, image_base64, image_name=""):
-        """Simple file format validation - PNG = valid, JPG/JPEG = invalid"""
-        try:
-            # Extract file extension from image name
-            if not image_name:
-                return True, "Validation skipped (no filename provided)"
-            
-            # Get file extension (lowercase)
-            file_ext = image_name.lower().split('.')[-1] if '.' in image_name else ''
-            
-            print(f"  → File format detected: .{file_ext}")
-            
-            # ACCEPT only PNG files
-            if file_ext == 'png':
-                return True, "✅ Valid PNG format - Property image accepted"
-            
-            # REJECT JPG/JPEG files
-            elif file_ext in ['jpg', 'jpeg']:
-                return False, "This is not a housing property image. Please upload housing properties"
-            
-            # REJECT other formats
-            else:
-                return False, f"❌ .{file_ext} Image  invalid. Please upload housing property images  only."
-                
-        except Exception as e:
-            print(f"  ⚠️ Validation error: {e}")
-            # If validation fails, proceed with analysis (fail-open)
-            return True, "Validation skipped due to error"
-    
-    def _analyze_with_grok(self, image_base64, notes, image_name):
-        """Analyze using Grok Vision API"""
-        
-        try:
-            # Prepare the enhanced prompt for Grok
-            prompt = f"""PROPERTY INSPECTION ANALYSIS - ACCURACY IS CRITICAL
-
-Inspector Notes: {notes if notes else "No additional notes provided"}
-
-ANALYSIS PROTOCOL:
-You are conducting a professional property inspection. Your analysis must be:
-1. ACCURATE - Only report defects you can clearly identify in the image
-2. SPECIFIC - Provide exact locations and detailed descriptions
-3. PROFESSIONAL - Use proper terminology and IRC code references
-4. REALISTIC - Mix severity levels appropriately (not everything is critical)
-
-INSPECTION CHECKLIST - Examine the image for:
-✓ Structural Elements: Cracks, settlement, foundation issues, load-bearing concerns
-✓ Water/Moisture: Stains, dampness, mold, leaks, drainage problems
-✓ Electrical: Exposed wiring, improper installations, safety hazards
-✓ Plumbing: Leaks, corrosion, improper fixtures, water damage
-✓ Exterior: Roof damage, siding issues, window/door problems
-✓ Interior: Wall/ceiling damage, flooring issues, paint deterioration
-
-DEFECT CLASSIFICATION CRITERIA:
-
-**HIGH SEVERITY** (Immediate Action Required):
-- Active structural failure or imminent collapse risk
-- Active water intrusion causing ongoing damage
-- Exposed electrical hazards posing shock/fire risk
-- Foundation settlement affecting structural integrity
-- Roof damage allowing water penetration
-
-**MEDIUM SEVERITY** (Repair Within 30 Days):
-- Historical water damage (stains, but not active)
-- Minor structural cracks (non-load-bearing)
-- Deteriorated materials needing replacement
-- Code violations without immediate safety risk
-- Functional issues affecting property use
-
-**LOW SEVERITY** (Routine Maintenance):
-- Cosmetic damage (paint, minor surface issues)
-- Normal wear and tear
-- Preventive maintenance items
-- Minor aesthetic concerns
-
-CONFIDENCE LEVEL GUIDELINES:
-- 0.90-1.00: Defect is crystal clear, well-lit, unobstructed view
-- 0.75-0.89: Defect is clearly visible, good image quality
-- 0.60-0.74: Defect is visible but image quality affects certainty
-- 0.50-0.59: Defect is suspected but needs verification
-- Below 0.50: Too uncertain - DO NOT REPORT
-
-COST ESTIMATION (Indian Market - INR):
-- Cosmetic/Minor: ₹1,000 - ₹5,000
-- Moderate Repairs: ₹5,000 - ₹15,000
-- Major Structural: ₹15,000 - ₹40,000
-- Critical/Extensive: ₹40,000 - ₹80,000
-
-IRC CODE REFERENCE:
-- R403.1: Foundation systems
-- R302.1: Fire-resistant construction
-- R602.10: Wall bracing
-- R806.1: Roof ventilation
-- E3404.1/E3605.1: Electrical systems
-- P2903.2: Plumbing systems
-- R703.1: Exterior coverings
-- R308.4: Glazing (windows)
-- R905.2: Roof coverings
-- M1411.3: HVAC systems
-
-OUTPUT FORMAT (JSON ONLY):
-[
-  {{
-    "type": "Specific Defect Name",
-    "severity": "High/Medium/Low",
-    "location": "Exact location visible in image",
-    "confidence": 0.85,
-    "description": "Detailed professional description of what you observe and why it's a concern",
-    "irc_code": "Most relevant code",
-    "estimated_cost": 45000,
-    "image_ref": "{image_name}"
-  }}
-]
-
-CRITICAL REQUIREMENTS:
-✓ Return 2-5 defects (quality over quantity)
-✓ Only report defects with confidence ≥ 0.60
-✓ Vary severity levels realistically
-✓ Be specific about locations
-✓ Provide professional descriptions
-✓ Return ONLY valid JSON array, NO other text
-✓ Ensure all costs are realistic for Indian market"""
-
-            # Make API call to Grok
-            headers = {
-                "Authorization": f"Bearer {self.grok_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": "grok-vision-beta",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert property inspector with 20+ years of experience in structural assessment, building codes, and property defect identification. You provide accurate, detailed, and professional property inspection reports."
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}",
-                                    "detail": "high"  # Request high-detail image analysis
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "temperature": 0.3,  # Lower temperature for more consistent, accurate results
-                "max_tokens": 3000,  # Increased for detailed analysis
-                "top_p": 0.9  # Focus on most likely tokens for accuracy
-            }
-            
-            response = requests.post(self.grok_url, headers=headers, json=payload, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                
-                # Extract JSON from response
-                try:
-                    # Try to parse the entire response as JSON
-                    defects = json.loads(content)
-                except json.JSONDecodeError:
-                    # If that fails, try to extract JSON array from text
-                    import re
-                    json_match = re.search(r'\[.*\]', content, re.DOTALL)
-                    if json_match:
-                        defects = json.loads(json_match.group())
-                    else:
-                        raise ValueError("Could not extract JSON from response")
-                
-                # Validate and clean defects
-                cleaned_defects = []
-                MIN_CONFIDENCE = 0.60  # Only accept defects with 60%+ confidence
-                
-                for defect in defects:
-                    if isinstance(defect, dict) and 'type' in defect:
-                        confidence = float(defect.get("confidence", 0.8))
-                        
-                        # Filter out low-confidence detections for accuracy
-                        if confidence < MIN_CONFIDENCE:
-                            print(f"Filtered out low-confidence defect: {defect.get('type')} (confidence: {confidence})")
-                            continue
-                        
-                        # Ensure all required fields exist
-                        cleaned_defect = {
-                            "type": defect.get("type", "Unknown Defect"),
-                            "severity": defect.get("severity", "Medium"),
-                            "location": defect.get("location", "Unknown Location"),
-                            "confidence": confidence,
-                            "description": defect.get("description", "No description provided"),
-                            "irc_code": defect.get("irc_code", "N/A"),
-                            "estimated_cost": int(defect.get("estimated_cost", 10000)),
-                            "image_ref": image_name
-                        }
-                        cleaned_defects.append(cleaned_defect)
-                
-                # Sort by severity and confidence
-                severity_order = {"High": 0, "Medium": 1, "Low": 2}
-                cleaned_defects.sort(key=lambda x: (severity_order.get(x["severity"], 3), -x["confidence"]))
-                
-                print(f"Grok API returned {len(defects)} defects, {len(cleaned_defects)} passed confidence threshold")
-                
-                return cleaned_defects if cleaned_defects else self._get_fallback_defects(image_base64, image_name)
-            
-            else:
-                print(f"Grok API Error: {response.status_code} - {response.text}")
-                return self._get_fallback_defects(image_base64, image_name)
-                
-        except Exception as e:
-            print(f"Error calling Grok API: {e}")
-            return self._get_fallback_defects(image_base64, image_name)
-    
-    def _get_fallback_defects(self, image_base64, image_name):
-        """Fallback defects if API fails - still varies by image"""
-        image_hash = hashlib.md5(image_base64.encode() if isinstance(image_base64, str) else image_base64).hexdigest()
-        seed = int(image_hash[:8], 16)
-        random.seed(seed)
-        
-        templates = [
-            {"type": "Structural Crack", "severity": "High", "location": "Foundation Wall", "cost": 50000, "irc": "R403.1"},
-            {"type": "Water Damage", "severity": "High", "location": "Ceiling", "cost": 35000, "irc": "R806.1"},
-            {"type": "Electrical Hazard", "severity": "Medium", "location": "Main Panel", "cost": 18000, "irc": "E3404.1"},
-            {"type": "Plumbing Leak", "severity": "Medium", "location": "Under Sink", "cost": 8000, "irc": "P2903.2"},
-            {"type": "Paint Deterioration", "severity": "Low", "location": "Exterior Wall", "cost": 12000, "irc": "R703.1"}
-        ]
-        
-        num_defects = 2 + (seed % 3)
-        selected = random.sample(templates, min(num_defects, len(templates)))
-        
-        return [{
-            "type": t["type"],
-            "severity": t["severity"],
-            "location": t["location"],
-            "confidence": round(0.75 + random.uniform(0, 0.2), 2),
-            "description": f"{t['type']} detected at {t['location']}",
-            "irc_code": t["irc"],
-            "estimated_cost": int(t["cost"] * random.uniform(0.8, 1.2)),
-            "image_ref": image_name
-        } for t in selected]
-    
-    def _analyze_with_openai(self, image_base64, notes, image_name):
-        """Analyze using OpenAI GPT-4 Vision - Generally more accurate"""
-        try:
-            if not self.openai_client:
-                return []
-            
-            # Same comprehensive prompt as Grok
-            prompt = f"""PROPERTY INSPECTION ANALYSIS - MAXIMUM ACCURACY REQUIRED
-
-Inspector Notes: {notes if notes else "No additional notes"}
-
-You are an expert property inspector. Analyze this image with EXTREME ACCURACY.
-
-CRITICAL: Only report defects you can CLEARLY see. Be SPECIFIC about locations.
-
-For each defect, provide JSON with:
-- type: Specific defect name
-- severity: High/Medium/Low (be realistic)
-- location: Exact location in image
-- confidence: 0.60-1.00 (only report if ≥0.60)
-- description: Detailed professional description
-- irc_code: Most relevant IRC code
-- estimated_cost: Realistic INR amount
-
-Return ONLY a JSON array. No other text."""
-
-            # Call OpenAI GPT-4 Vision
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o",  # Latest GPT-4 with vision
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert property inspector with 20+ years of experience. Provide accurate, detailed property defect analysis."
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                temperature=0.2,  # Very low for maximum accuracy
-                max_tokens=3000
-            )
-            
-            content = response.choices[0].message.content
-            
-            # Parse JSON
-            try:
-                defects = json.loads(content)
-            except json.JSONDecodeError:
-                import re
-                json_match = re.search(r'\[.*\]', content, re.DOTALL)
-                if json_match:
-                    defects = json.loads(json_match.group())
-                else:
-                    return []
-            
-            # Clean and validate
-            cleaned = []
-            MIN_CONFIDENCE = 0.60
-            
-            for d in defects:
-                if isinstance(d, dict) and 'type' in d:
-                    conf = float(d.get("confidence", 0.8))
-                    if conf >= MIN_CONFIDENCE:
-                        cleaned.append({
-                            "type": d.get("type", "Unknown"),
-                            "severity": d.get("severity", "Medium"),
-                            "location": d.get("location", "Unknown"),
-                            "confidence": conf,
-                            "description": d.get("description", ""),
-                            "irc_code": d.get("irc_code", "N/A"),
-                            "estimated_cost": int(d.get("estimated_cost", 10000)),
-                            "image_ref": image_name,
-                            "source": "OpenAI"  # Mark source
-                        })
-            
-            return cleaned
-            
-        except Exception as e:
-            print(f"  ⚠️ OpenAI API Error: {e}")
-            return []
-    
-    def _combine_ai_results(self, openai_defects, grok_defects, image_name):
-        """Combine results from both AIs for maximum accuracy"""
-        
-        # If only one AI worked, use its results
-        if not openai_defects and not grok_defects:
-            return []
-        if not openai_defects:
-            return grok_defects
-        if not grok_defects:
-            return openai_defects
-        
-        # Both AIs found defects - combine intelligently
-        combined = []
-        
-        # Start with OpenAI results (generally more accurate)
-        for openai_def in openai_defects:
-            # Check if Grok also found similar defect
-            similar_in_grok = None
-            for grok_def in grok_defects:
-                # Check if defects are similar (same type and location keywords match)
-                if (openai_def["type"].lower() in grok_def["type"].lower() or 
-                    grok_def["type"].lower() in openai_def["type"].lower()):
-                    similar_in_grok = grok_def
-                    break
-            
-            if similar_in_grok:
-                # Both AIs agree - boost confidence and average costs
-                boosted_confidence = min(0.95, (openai_def["confidence"] + similar_in_grok["confidence"]) / 2 + 0.1)
-                avg_cost = int((openai_def["estimated_cost"] + similar_in_grok["estimated_cost"]) / 2)
-                
-                combined.append({
-                    **openai_def,
-                    "confidence": boosted_confidence,
-                    "estimated_cost": avg_cost,
-                    "source": "Both AIs (High Confidence)"
-                })
-                grok_defects.remove(similar_in_grok)  # Don't add twice
-            else:
-                # Only OpenAI found it
-                combined.append(openai_def)
-        
-        # Add remaining Grok-only defects
-        for grok_def in grok_defects:
-            grok_def["source"] = "Grok"
-            combined.append(grok_def)
-        
-        # Sort by confidence (highest first)
-        combined.sort(key=lambda x: -x["confidence"])
-        
-        # Apply aggressive cost reduction to make estimates very affordable
-        # Reduce individual defect costs by 70% (multiply by 0.3)
-        for defect in combined:
-            defect["estimated_cost"] = int(defect["estimated_cost"] * 0.3)
-        
-        # Limit to top 5 most confident defects
-        return combined[:5]
-
-class ComplianceAgent:
-    """Enhanced RAG-based compliance checker"""
-    
-    def __init__(self):
-        self.knowledge_base = IRCKnowledgeBase()
-    
-    def check_compliance(self, defects):
-        """Check compliance using RAG system"""
-        violations = []
-        rag_references = []
-        
-        for defect in defects:
-            # RAG: Retrieve IRC code information
-            irc_code = defect.get("irc_code", "")
-            code_info = self.knowledge_base.retrieve_code(irc_code)
-            
-            if code_info:
-                violation_entry = {
-                    "defect": defect["type"],
-                    "location": defect["location"],
-                    "code": irc_code,
-                    "code_title": code_info.get("title", ""),
-                    "code_description": code_info.get("description", ""),
-                    "status": "Violation" if defect["severity"] == "High" else "Review Required",
-                    "severity": defect["severity"],
-                    "rag_retrieved": True,
-                    "category": code_info.get("category", "General")
-                }
-                violations.append(violation_entry)
-                rag_references.append(f"{irc_code}: {code_info.get('title', '')}")
-            else:
-                # Fallback: Search for related codes via RAG
-                matched_codes = self.knowledge_base.search_by_violation(defect["type"])
-                if matched_codes:
-                    code_match = matched_codes[0]
-                    violation_entry = {
-                        "defect": defect["type"],
-                        "location": defect["location"],
-                        "code": code_match["code"],
-                        "code_title": code_match.get("title", ""),
-                        "code_description": code_match.get("description", ""),
-                        "status": "Review Required",
-                        "severity": defect["severity"],
-                        "rag_retrieved": True,
-                        "rag_confidence": code_match.get("confidence", 0.8),
-                        "category": "Retrieved via RAG"
-                    }
-                    violations.append(violation_entry)
-        
-        return {
-            "violations": violations,
-            "rag_references": rag_references,
-            "total_violations": len([v for v in violations if v["status"] == "Violation"]),
-            "total_reviews": len([v for v in violations if v["status"] == "Review Required"])
-        }
-
-class FinanceAgent:
-    """Enhanced Cost estimation and report generation"""
-    
-    def generate_report(self, defects, compliance_data):
-        """Generate comprehensive report with dynamic calculations"""
-        
-        # Calculate base total cost
-        base_total_cost = sum(d["estimated_cost"] for d in defects)
-        
-        # Dynamic risk score calculation
-        risk_score = self._calculate_risk_score(defects)
-        
-        # Adjust total cost based on risk score
-        # Using realistic multipliers based on risk level
-        # A higher risk property often requires specialized inspection and higher labor overhead
-        if risk_score < 30:
-            cost_multiplier = 1.0  # Basic repairs
-        elif risk_score < 50:
-            cost_multiplier = 1.1  # Moderate repairs with coordination
-        elif risk_score < 70:
-            cost_multiplier = 1.25  # Complex repairs
-        else:
-            cost_multiplier = 1.4  # High-risk structural repairs with professional oversight
-        
-        total_cost = int(base_total_cost * cost_multiplier)
-        
-        # Categorize defects
-        defects_by_severity = {
-            "high": [d for d in defects if d["severity"] == "High"],
-            "medium": [d for d in defects if d["severity"] == "Medium"],
-            "low": [d for d in defects if d["severity"] == "Low"]
-        }
-        
-        report = {
-            "total_cost": total_cost,
-            "risk_score": risk_score,
-            "total_defects": len(defects),
-            "defects_by_severity": defects_by_severity,
-            "high_risk": len(defects_by_severity["high"]),
-            "medium_risk": len(defects_by_severity["medium"]),
-            "low_risk": len(defects_by_severity["low"]),
-            "compliance_violations": compliance_data.get("total_violations", 0),
-            "compliance_reviews": compliance_data.get("total_reviews", 0),
-            "violations": compliance_data.get("violations", []),
-            "rag_references": compliance_data.get("rag_references", []),
-            "recommendations": self._generate_recommendations(defects, risk_score),
-            "all_defects": defects,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        return report
-    
-    def _calculate_risk_score(self, defects):
-        """Dynamic risk score based on actual defects with realistic variation"""
-        if not defects:
-            return 10  # Minimal risk if no defects
-        
-        # Check if ALL defects are invalid images (rejected by validation)
-        # This handles both single and multiple invalid image uploads
-        all_invalid = all(d.get("type") == "Image Not Accepted" for d in defects)
-        if all_invalid:
-            return 0  # Zero risk for invalid images (single or multiple)
-        
-        # Base score starts at 0
-        base_score = 0
-        
-        # Count defects by severity
-        high_count = sum(1 for d in defects if d["severity"] == "High")
-        medium_count = sum(1 for d in defects if d["severity"] == "Medium")
-        low_count = sum(1 for d in defects if d["severity"] == "Low")
-        
-        # Weighted scoring with diminishing returns
-        # High severity: 20-30 points each (diminishing)
-        for i in range(high_count):
-            base_score += max(20, 30 - (i * 5))
-        
-        # Medium severity: 8-15 points each (diminishing)
-        for i in range(medium_count):
-            base_score += max(8, 15 - (i * 3))
-        
-        # Low severity: 3-6 points each (diminishing)
-        for i in range(low_count):
-            base_score += max(3, 6 - (i * 1))
-        
-        # Add confidence-weighted adjustment
-        avg_confidence = sum(d.get("confidence", 0.8) for d in defects) / len(defects)
-        confidence_multiplier = 0.8 + (avg_confidence * 0.4)  # 0.8 to 1.2 range
-        base_score = int(base_score * confidence_multiplier)
-        
-        # Add variation based on defect types (structural issues are more serious)
-        structural_types = ["Structural Crack", "Foundation Settlement", "Roof Damage"]
-        structural_count = sum(1 for d in defects if d["type"] in structural_types)
-        base_score += structural_count * 5
-        
-        # Add small random variation for realism (±3 points)
-        import random
-        variation = random.randint(-3, 3)
-        base_score += variation
-        
-        # Ensure score is between 15 and 95 (never perfect, never catastrophic)
-        final_score = max(15, min(95, base_score))
-        
-        return final_score
-    
-    def _generate_recommendations(self, defects, risk_score):
-        """Generate dynamic recommendations based on defects and risk score"""
-        recs = []
-        
-        # Add overall risk assessment
-        if risk_score >= 70:
-            recs.append(f"🚨 HIGH RISK PROPERTY (Score: {risk_score}/100) - Immediate professional inspection recommended")
-        elif risk_score >= 50:
-            recs.append(f"⚠️ MODERATE RISK (Score: {risk_score}/100) - Schedule comprehensive repairs within 30 days")
-        else:
-            recs.append(f"ℹ️ LOW-MODERATE RISK (Score: {risk_score}/100) - Routine maintenance and monitoring recommended")
-        
-        high_priority = [d for d in defects if d["severity"] == "High"]
-        for defect in high_priority[:3]:  # Top 3 high priority
-            recs.append(f"🚨 URGENT: Address {defect['type']} at {defect['location']} within 7 days")
-        
-        medium_priority = [d for d in defects if d["severity"] == "Medium"]
-        if medium_priority:
-            recs.append(f"⚠️ Schedule repairs for {len(medium_priority)} medium-priority issue(s) within 30 days")
-        
-        low_priority = [d for d in defects if d["severity"] == "Low"]
-        if low_priority:
-            recs.append(f"ℹ️ Monitor {len(low_priority)} low-priority issue(s) and address during routine maintenance")
-        
-        return recs
-
-# Multi-Agent Orchestrator
-class AgentOrchestrator:
-    """Enhanced orchestrator with RAG integration"""
-    
-    def __init__(self):
-        self.vision_agent = VisionAgent()
-        self.compliance_agent = ComplianceAgent()
-        self.finance_agent = FinanceAgent()
-    
-    def process_inspection(self, images, notes):
-        """Process inspection with full multi-agent workflow"""
-        
-        # Step 1: Vision Agent - Analyze all images
-        all_defects = []
-        for idx, img in enumerate(images):
-            try:
-                img.seek(0)  # Reset file pointer
-                img_bytes = img.read()
-                img_base64 = base64.b64encode(img_bytes).decode()
-                defects = self.vision_agent.analyze_image(img_base64, notes, img.name)
-                all_defects.extend(defects)
-            except Exception as e:
-                print(f"Error processing image {idx}: {e}")
-        
-        # Step 2: Compliance Agent - RAG-based IRC checking
-        compliance_data = self.compliance_agent.check_compliance(all_defects)
-        
-        # Step 3: Finance Agent - Generate report
-        report = self.finance_agent.generate_report(all_defects, compliance_data)
-        
-        return report
-
-class ChatAgent:
-    """AI-powered chatbot for property inspection questions"""
-    
-    def __init__(self, openai_api_key=None):
-        self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
-        if self.openai_api_key and OPENAI_AVAILABLE:
-            self.client = OpenAI(api_key=self.openai_api_key)
-        elif self.openai_api_key and not OPENAI_AVAILABLE:
-            self.client = None
-            print("WARNING: OpenAI library not installed for ChatAgent")
-        else:
-            self.client = None
-            print("WARNING: No OpenAI API key found for ChatAgent")
-    
-    def chat(self, user_message, analysis_context, chat_history=None, language='en'):
-        """Generate chatbot response based on analysis context"""
-        if not self.client:
-            return "❌ Chatbot unavailable. Please set OPENAI_API_KEY environment variable."
-        
-        try:
-            # Build context from analysis results
-            defects_summary = self._format_defects(analysis_context.get('defects', []))
-            
-            context = f"""You are a helpful property inspection assistant. Answer questions about this property inspection in a clear, professional, and friendly manner.
-
-PROPERTY INSPECTION SUMMARY:
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Risk Score: {analysis_context.get('risk_score', 'N/A')}/100
-Total Defects Found: {analysis_context.get('total_defects', 0)}
-High Risk Issues: {analysis_context.get('high_risk', 0)}
-Medium Risk Issues: {analysis_context.get('medium_risk', 0)}
-Low Risk Issues: {analysis_context.get('low_risk', 0)}
-Estimated Repair Cost: ₹{analysis_context.get('total_cost', 0):,}
-
-DETECTED DEFECTS:
-{defects_summary}
-
-INSTRUCTIONS:
-- Answer questions clearly and concisely
-- Provide specific recommendations when asked
-- Reference the actual defects found in the inspection
-- Be helpful and professional
-- If asked about costs, use the estimated costs from the analysis
-- If asked about urgency, reference the severity levels
-- Keep responses under 150 words unless more detail is specifically requested
-"""
-            
-            # Build messages
-            messages = [{"role": "system", "content": context}]
-            
-            # Add chat history if provided
-            if chat_history:
-                messages.extend(chat_history)
-            
-            # Add user message
-            messages.append({"role": "user", "content": user_message})
-            
-            # Call OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=250
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"ChatAgent error: {e}")
-            return f"❌ Sorry, I encountered an error: {str(e)}"
-    
-    def _format_defects(self, defects):
-        """Format defects for context"""
-        if not defects:
-            return "No defects found."
-        
-        formatted = []
-        for idx, defect in enumerate(defects, 1):
-            formatted.append(f"""
-{idx}. {defect.get('type', 'Unknown')} ({defect.get('severity', 'Unknown')} Severity)
-   Location: {defect.get('location', 'Unknown')}
-   Cost: ₹{defect.get('cost', 0):,}
-   Description: {defect.get('description', 'N/A')}
-""")
-        
-        return "\n".join(formatted)
+# simplified_backend.py - Compatibility shim; the backend now lives in the safenest package
+from safenest.cache import VISION_PROMPT_VERSION, VisionResultCache
+from safenest.chat import ChatAgent
+from safenest.clients import OPENAI_AVAILABLE, get_openai_client
+from safenest.compliance import NUMPY_AVAILABLE, ComplianceAgent
+from safenest.finance import PANDAS_AVAILABLE, FinanceAgent
+from safenest.imaging import PIL_AVAILABLE, ImagePreprocessor
+from safenest.knowledge import (
+    DEFAULT_JURISDICTION, KB_COMPILED_PATH, KB_JSON_PATH, KB_SQLITE_PATH,
+    CompiledCodeStore, IRCKnowledgeBase, SQLiteCodeStore, compile_knowledge_base, import_knowledge_base_to_sqlite
+)
+from safenest.orchestrator import AgentOrchestrator
+from safenest.text import tokenize
+from safenest.vision import VisionAgent